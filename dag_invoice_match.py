@@ -4,6 +4,7 @@ import os
 from datetime import datetime
 
 from airflow import DAG
+from airflow.exceptions import AirflowSkipException
 from airflow.operators.python import PythonOperator
 
 
@@ -13,16 +14,59 @@ def task_bootstrap_opensearch():
 
 
 def task_bootstrap_qdrant():
-    from ai_finance.embedding.encoder import EmbeddingEncoder
+    from ai_finance.embedding.registry import get_embedding_dimension
     from ai_finance.storage.qdrant_client import ensure_collection
-    enc = EmbeddingEncoder()
-    ensure_collection(enc.dimension)
+    ensure_collection(get_embedding_dimension())
 
 
-def task_index_pipeline(**context):
+def task_plan_index_shards(**context):
+    # One op_kwargs entry per mapped index task, balanced by object size. Incremental
+    # runs keep a single manifest for the prefix, so they stay one unsharded task.
+    from ai_finance.config import get_settings
+    from ai_finance.ingestion.s3_ingest import list_s3_objects
+    from ai_finance.pipeline.sharding import plan_shards
+    from ai_finance.search.opensearch_client import begin_fast_load
+    settings = get_settings()
+    if settings.pipeline.index_incremental:
+        return [{}]
+    if settings.pipeline.index_fast_load:
+        # Restored by restore_index_settings, which runs even when a shard fails
+        context["ti"].xcom_push(key="fast_load", value=begin_fast_load())
+    objects = list_s3_objects(prefix=os.getenv("AWS_S3_PREFIX"))
+    shards = [keys for keys in plan_shards(objects, settings.pipeline.index_shard_count) if keys]
+    return [{"keys": keys} for keys in shards] or [{}]
+
+
+def task_index_shard(keys=None, **context):
     from ai_finance.pipeline.index_pipeline import run_index_pipeline
     prefix = os.getenv("AWS_S3_PREFIX")
-    run_index_pipeline(s3_prefix=prefix)
+    return run_index_pipeline(s3_prefix=prefix, keys=keys)
+
+
+def task_restore_index_settings(**context):
+    from ai_finance.search.opensearch_client import end_fast_load
+    previous = context["ti"].xcom_pull(task_ids="plan_index_shards", key="fast_load")
+    if previous is not None:
+        end_fast_load(previous)
+
+
+def task_finalize_index(**context):
+    from ai_finance.pipeline.index_pipeline import finalize_index
+    indexed = context["ti"].xcom_pull(task_ids="run_index_shard")
+    if indexed is not None and not isinstance(indexed, int):
+        indexed = sum(n or 0 for n in indexed)
+    return finalize_index(expected=indexed)
+
+
+def task_match_export(**context):
+    # Resumes from its checkpoint when a previous try failed part-way. Optional: skipped
+    # unless both the invoices to match and the output location are configured.
+    source_prefix = os.getenv("MATCH_SOURCE_PREFIX")
+    output_path = os.getenv("MATCH_OUTPUT_PATH")
+    if not source_prefix or not output_path:
+        raise AirflowSkipException("MATCH_SOURCE_PREFIX and MATCH_OUTPUT_PATH are not both set")
+    from ai_finance.pipeline.match_pipeline import run_match_pipeline
+    return run_match_pipeline(source_prefix=source_prefix, output_path=output_path)
 
 
 with DAG(
@@ -34,8 +78,23 @@ with DAG(
 ) as dag:
     bootstrap_os = PythonOperator(task_id="bootstrap_opensearch", python_callable=task_bootstrap_opensearch)
     bootstrap_qd = PythonOperator(task_id="bootstrap_qdrant", python_callable=task_bootstrap_qdrant)
-    index_run = PythonOperator(task_id="run_index_pipeline", python_callable=task_index_pipeline)
+    plan_shards = PythonOperator(task_id="plan_index_shards", python_callable=task_plan_index_shards)
+    # Dynamic task mapping: one index task per shard, spread over the Airflow workers
+    index_shards = PythonOperator.partial(
+        task_id="run_index_shard",
+        python_callable=task_index_shard,
+    ).expand(op_kwargs=plan_shards.output)
+    # Refresh interval and replicas come back whatever happened to the shards; the count
+    # check (and everything after it) only runs when every shard succeeded
+    restore_settings = PythonOperator(
+        task_id="restore_index_settings",
+        python_callable=task_restore_index_settings,
+        trigger_rule="all_done",
+    )
+    finalize = PythonOperator(task_id="finalize_index", python_callable=task_finalize_index)
+    match_export = PythonOperator(task_id="run_match_export", python_callable=task_match_export)
 
-    [bootstrap_os, bootstrap_qd] >> index_run
+    [bootstrap_os, bootstrap_qd] >> plan_shards >> index_shards >> restore_settings >> finalize >> match_export
+    index_shards >> finalize
 
 
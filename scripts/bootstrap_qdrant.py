@@ -1,11 +1,10 @@
 from ai_finance.config import get_settings
-from ai_finance.embedding.encoder import EmbeddingEncoder
+from ai_finance.embedding.registry import get_embedding_dimension
 from ai_finance.storage.qdrant_client import ensure_collection
 
 
 def main() -> None:
-    enc = EmbeddingEncoder()
-    ensure_collection(enc.dimension)
+    ensure_collection(get_embedding_dimension())
     print("Qdrant collection ensured.")
 
 
@@ -0,0 +1,35 @@
+import argparse
+import json
+
+from ai_finance.benchmark.suite import run_benchmarks, write_report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end ingestion/indexing/matching benchmarks")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated synthetic corpus sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--index-rows", type=int, default=20000, help="Rows indexed and matched against per size")
+    parser.add_argument("--encode-rows", type=int, default=2000, help="Rows used for the encode benchmark")
+    parser.add_argument("--match-queries", type=int, default=200)
+    parser.add_argument("--rows-per-object", type=int, default=10000)
+    parser.add_argument("--format", choices=["csv", "json", "jsonl", "parquet"], default="csv")
+    parser.add_argument("--model", default=None, help="Override EMBEDDING_MODEL")
+    parser.add_argument("--output", default="benchmark_report.json")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        sizes=[int(s) for s in args.sizes.split(",") if s],
+        seed=args.seed,
+        index_rows=args.index_rows,
+        encode_rows=args.encode_rows,
+        match_queries=args.match_queries,
+        rows_per_object=args.rows_per_object,
+        fmt=args.format,
+        model_name=args.model,
+    )
+    write_report(report, args.output)
+    print(json.dumps(report["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import argparse
+import logging
+
+from ai_finance.config import get_settings
 from ai_finance.pipeline.index_pipeline import run_index_pipeline
 
 
@@ -6,6 +9,11 @@ def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--s3-bucket", help="Override S3 bucket", default=None)
     parser.add_argument("--s3-prefix", help="S3 prefix with data", default=None)
+    parser.add_argument("--stream", action="store_true", help="Index in bounded-memory chunks")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Records per streamed chunk")
+    parser.add_argument("--incremental", action="store_true", help="Only reindex changed objects and documents")
+    parser.add_argument("--date-from", default=None, help="Only index stays checking in on or after this date")
+    parser.add_argument("--date-to", default=None, help="Only index stays checking out on or before this date")
     args = parser.parse_args()
 
     # Optionally override bucket via env to keep config centralized
@@ -13,7 +21,15 @@ def main() -> None:
         import os
         os.environ["AWS_S3_BUCKET"] = args.s3_bucket
 
-    count = run_index_pipeline(s3_prefix=args.s3_prefix)
+    logging.basicConfig(level=get_settings().logging.level)
+    count = run_index_pipeline(
+        s3_prefix=args.s3_prefix,
+        stream=args.stream or None,
+        chunk_size=args.chunk_size,
+        incremental=args.incremental or None,
+        date_from=args.date_from,
+        date_to=args.date_to,
+    )
     print(f"Indexed {count} documents")
 
 
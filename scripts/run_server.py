@@ -0,0 +1,24 @@
+import argparse
+import logging
+
+import uvicorn
+
+from ai_finance.config import get_settings
+from ai_finance.serving.app import create_app
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Resident match server with dynamic micro-batching")
+    parser.add_argument("--host", default=settings.server.host)
+    parser.add_argument("--port", type=int, default=settings.server.port)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.logging.level)
+    # One process keeps the model, the caches and the pooled clients warm; scale out
+    # with more server processes rather than uvicorn workers sharing a port
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level=settings.logging.level.lower())
+
+
+if __name__ == "__main__":
+    main()
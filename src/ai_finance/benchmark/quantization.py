@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def scalar_quantize(vectors: np.ndarray, quantile: float = 0.99) -> Tuple[np.ndarray, float, float]:
+    # int8 scalar quantization as Qdrant does it: clip to the central quantile range,
+    # then map linearly onto 256 levels
+    tail = (1.0 - quantile) / 2.0
+    low, high = np.quantile(vectors, [tail, 1.0 - tail])
+    scale = (high - low) / 255.0 or 1.0
+    codes = np.round((np.clip(vectors, low, high) - low) / scale).astype(np.uint8)
+    return codes, float(low), float(scale)
+
+
+def binary_quantize(vectors: np.ndarray) -> np.ndarray:
+    return np.packbits(vectors > 0, axis=1)
+
+
+def _recall(found: np.ndarray, exact: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(f, e)) for f, e in zip(found, exact))
+    return hits / exact.size if exact.size else 1.0
+
+
+def _rescored(approx: np.ndarray, exact_scores: np.ndarray, k: int, oversampling: float) -> np.ndarray:
+    # Take k * oversampling candidates by quantized score, rescore with the original vectors
+    pool = _top_k(approx, max(k, int(np.ceil(k * oversampling))))
+    rescored = np.take_along_axis(exact_scores, pool, axis=1)
+    order = np.argsort(-rescored, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(pool, order, axis=1)
+
+
+def quantization_tradeoff(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    top_k: int = 10,
+    oversampling: float = 2.0,
+    quantile: float = 0.99,
+) -> Dict[str, Dict[str, float]]:
+    # Simulates the quantized collection in NumPy: vector memory saved and top-k recall
+    # lost against exact float32 search, with and without rescoring
+    corpus = np.asarray(corpus, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    exact_scores = queries @ corpus.T
+    exact = _top_k(exact_scores, top_k)
+    float_bytes = corpus.size * 4
+
+    codes, low, scale = scalar_quantize(corpus, quantile)
+    scalar_scores = queries @ (codes.astype(np.float32) * scale + low).T
+    bits = binary_quantize(corpus)
+    signs = np.unpackbits(bits, axis=1, count=corpus.shape[1]).astype(np.float32) * 2.0 - 1.0
+    binary_scores = np.sign(queries) @ signs.T
+
+    report: Dict[str, Dict[str, float]] = {}
+    for name, approx, size in (
+        ("scalar", scalar_scores, codes.nbytes),
+        ("binary", binary_scores, bits.nbytes),
+    ):
+        report[name] = {
+            "float32_bytes": int(float_bytes),
+            "quantized_bytes": int(size),
+            "memory_saved_ratio": 1.0 - size / float_bytes if float_bytes else 0.0,
+            "recall_at_k": _recall(_top_k(approx, top_k), exact),
+            "recall_at_k_rescored": _recall(_rescored(approx, exact_scores, top_k, oversampling), exact),
+        }
+    return report
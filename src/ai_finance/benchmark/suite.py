@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import json
+import os
+import platform
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_finance.benchmark.quantization import quantization_tradeoff
+from ai_finance.benchmark.synthetic import (
+    InMemoryS3,
+    generate_invoices,
+    generate_match_requests,
+    write_invoices_to_s3,
+)
+from ai_finance.config import get_settings
+from ai_finance.embedding.encoder import EmbeddingEncoder
+from ai_finance.ingestion.s3_ingest import load_invoices_from_s3, reset_s3_client, set_s3_client
+from ai_finance.matching.algorithm import multistage_match, multistage_match_batch
+from ai_finance.pipeline.index_pipeline import build_documents, build_texts_for_embedding, run_index_pipeline
+from ai_finance.search import opensearch_client
+from ai_finance.storage import qdrant_client
+
+BENCH_BUCKET = "benchmark"
+
+
+def _timed(fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def latency_summary(samples: Sequence[float]) -> Dict[str, float]:
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    if len(ms) == 0:
+        return {"count": 0}
+    return {
+        "count": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def _throughput(items: int, seconds: float) -> Dict[str, float]:
+    return {"items": int(items), "seconds": float(seconds), "items_per_s": float(items / seconds) if seconds else 0.0}
+
+
+@contextmanager
+def configure_local_backends(workdir: str) -> Iterator[InMemoryS3]:
+    # Points S3, OpenSearch and Qdrant at in-process stand-ins, and every file an index or
+    # match run writes (manifest, index generation, match output/checkpoint) at workdir,
+    # so runs need no services and leave nothing behind. The settings are restored on exit.
+    settings = get_settings()
+    overrides = [
+        (settings.aws, "s3_bucket", BENCH_BUCKET),
+        (settings.opensearch, "backend", "local"),
+        (settings.opensearch, "local_path", os.path.join(workdir, "bm25")),
+        (settings.qdrant, "backend", "local"),
+        (settings.qdrant, "local_path", os.path.join(workdir, "vectors")),
+        (settings.pipeline, "index_streaming", False),
+        (settings.pipeline, "index_incremental", False),
+        (settings.pipeline, "manifest_path", os.path.join(workdir, "index_manifest.json")),
+        (settings.pipeline, "index_generation_path", os.path.join(workdir, "index_generation.json")),
+        (settings.pipeline, "match_output_path", os.path.join(workdir, "match_output")),
+        (settings.pipeline, "match_checkpoint_path", os.path.join(workdir, "match_checkpoint.json")),
+    ]
+    previous = [(section, field, getattr(section, field)) for section, field, _ in overrides]
+    for section, field, value in overrides:
+        setattr(section, field, value)
+    opensearch_client.reset_local_index()
+    qdrant_client.reset_local_index()
+    s3 = InMemoryS3()
+    set_s3_client(s3)
+    try:
+        yield s3
+    finally:
+        for section, field, value in previous:
+            setattr(section, field, value)
+        # Dropped rather than restored: the next use rebuilds them from the restored settings
+        opensearch_client.reset_local_index()
+        qdrant_client.reset_local_index()
+        reset_s3_client()
+
+
+def bench_size(
+    size: int,
+    encoder: EmbeddingEncoder,
+    seed: int = 42,
+    index_rows: int = 20000,
+    encode_rows: int = 2000,
+    match_queries: int = 200,
+    rows_per_object: int = 10000,
+    fmt: str = "csv",
+) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="ai-finance-bench-") as workdir, configure_local_backends(workdir) as s3:
+        invoices = generate_invoices(size, seed=seed)
+        prefix = f"bench/{size}/"
+        write_invoices_to_s3(s3, invoices, BENCH_BUCKET, prefix, rows_per_object=rows_per_object, fmt=fmt)
+        stages: Dict[str, Any] = {}
+
+        df, seconds = _timed(load_invoices_from_s3, prefix)
+        stages["load_invoices_from_s3"] = _throughput(len(df), seconds)
+
+        documents, seconds = _timed(build_documents, df)
+        stages["build_documents"] = _throughput(len(documents), seconds)
+        del df
+
+        texts = build_texts_for_embedding(documents[:encode_rows])
+        corpus_vectors, seconds = _timed(encoder.encode, texts)
+        stages["encode"] = _throughput(len(texts), seconds)
+        del documents
+
+        # Indexing and matching run on a bounded subset; embedding 1M rows on CPU is not a benchmark
+        indexed = invoices.iloc[:index_rows]
+        index_prefix = f"bench/{size}-index/"
+        write_invoices_to_s3(s3, indexed, BENCH_BUCKET, index_prefix, rows_per_object=rows_per_object, fmt=fmt)
+        count, seconds = _timed(run_index_pipeline, index_prefix)
+        stages["run_index_pipeline"] = _throughput(count, seconds)
+
+        pairs = generate_match_requests(indexed, match_queries, seed=seed + 1)
+        latencies: List[float] = []
+        hits = 0
+        for request, expected in pairs:
+            candidates, seconds = _timed(
+                multistage_match,
+                request.query_text,
+                request.source_doc,
+                hotel_name=request.hotel_name,
+                date_from=request.date_from,
+                date_to=request.date_to,
+                encoder=encoder,
+            )
+            latencies.append(seconds)
+            hits += bool(candidates) and candidates[0].invoice_id == expected
+        stages["multistage_match"] = {
+            **latency_summary(latencies),
+            **_throughput(len(latencies), float(sum(latencies))),
+            "top1_accuracy": hits / len(pairs) if pairs else 0.0,
+        }
+
+        _, seconds = _timed(multistage_match_batch, [r for r, _ in pairs], encoder=encoder)
+        stages["multistage_match_batch"] = _throughput(len(pairs), seconds)
+
+        # Memory saved and recall lost by Qdrant scalar/binary quantization, simulated on the encode corpus
+        settings = get_settings()
+        query_vectors = encoder.encode([r.query_text for r, _ in pairs])
+        stages["quantization"] = quantization_tradeoff(
+            corpus_vectors,
+            query_vectors,
+            top_k=settings.pipeline.top_k_vector,
+            oversampling=settings.qdrant.oversampling,
+            quantile=settings.qdrant.quantization_quantile,
+        )
+
+        return {"size": size, "indexed_rows": int(len(indexed)), "stages": stages}
+
+
+def run_benchmarks(
+    sizes: Sequence[int],
+    seed: int = 42,
+    index_rows: int = 20000,
+    encode_rows: int = 2000,
+    match_queries: int = 200,
+    rows_per_object: int = 10000,
+    fmt: str = "csv",
+    model_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    settings = get_settings()
+    encoder = EmbeddingEncoder(model_name)
+    results = [
+        bench_size(
+            size,
+            encoder,
+            seed=seed,
+            index_rows=index_rows,
+            encode_rows=encode_rows,
+            match_queries=match_queries,
+            rows_per_object=rows_per_object,
+            fmt=fmt,
+        )
+        for size in sizes
+    ]
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "format": fmt,
+            "model": encoder.model_name,
+            "embedding_backend": encoder.backend,
+            "embedding_workers": encoder.workers,
+            "embedding_batch_size": encoder.batch_size,
+            "top_k_bm25": settings.pipeline.top_k_bm25,
+            "top_k_vector": settings.pipeline.top_k_vector,
+            "vector_mode": settings.pipeline.vector_mode,
+            "qdrant_quantization": settings.qdrant.quantization,
+            "qdrant_oversampling": settings.qdrant.oversampling,
+        },
+        "results": results,
+    }
+
+
+def write_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
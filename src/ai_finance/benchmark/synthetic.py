@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import hashlib
+import io
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from ai_finance.matching.algorithm import MatchRequest
+
+FIRST_NAMES = [
+    "John", "Jane", "Michael", "Maria", "David", "Sarah", "James", "Laura", "Robert", "Anna",
+    "William", "Sofia", "Thomas", "Emma", "Daniel", "Olivia", "Jose", "Chloe", "Ahmed", "Yuki",
+    "Francois", "Zoe", "Lukas", "Ines", "Mateo", "Priya", "Kenji", "Fatima", "Oliver", "Hannah",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Garcia", "Muller", "Brown", "Rossi", "Martin", "Dubois", "Tanaka", "Khan",
+    "Silva", "Nowak", "Jensen", "Lopez", "Kowalski", "Novak", "O'Brien", "Schmidt", "Moreau", "Haddad",
+    "Andersson", "Fernandez", "Ivanova", "Nakamura", "Costa", "Weber", "Dupont", "Singh", "Murphy", "Zhang",
+]
+HOTEL_BASES = [
+    "Grand Hotel", "Riverside Inn", "Harbor View Hotel", "Alpine Lodge", "City Center Suites",
+    "Royal Palace Hotel", "Seaside Resort", "Park Plaza", "Old Town Boutique Hotel", "Airport Hotel",
+    "Hotel Central", "Lakeside Retreat", "Mountain View Inn", "Metropolitan Hotel", "Garden Court Hotel",
+]
+CITIES = ["Paris", "Berlin", "Madrid", "Rome", "Vienna", "Lisbon", "Zurich", "Prague", "Dublin", "Oslo"]
+STREETS = ["Main St", "Station Rd", "Harbour Ave", "Kings Way", "Market Sq", "Park Lane", "Rue de Rivoli"]
+NOTES = [
+    "late checkout requested", "breakfast included", "corporate rate", "minibar charges disputed",
+    "room upgrade", "parking fee", "conference booking", "", "", "",
+]
+
+
+def _hotel_variant(rng: np.random.Generator, name: str) -> str:
+    # Spellings seen across billing systems for the same property
+    choice = rng.integers(0, 6)
+    if choice == 0:
+        return f"The {name}"
+    if choice == 1:
+        return name.upper()
+    if choice == 2:
+        return name.replace("Hotel", "Hôtel")
+    if choice == 3:
+        return f"{name} & Spa"
+    if choice == 4:
+        return name.replace(" ", "")
+    return name
+
+
+def add_typo(rng: np.random.Generator, text: str) -> str:
+    if len(text) < 3:
+        return text
+    pos = int(rng.integers(1, len(text) - 1))
+    op = rng.integers(0, 4)
+    if op == 0:  # transposition
+        return text[:pos] + text[pos + 1] + text[pos] + text[pos + 2:]
+    if op == 1:  # deletion
+        return text[:pos] + text[pos + 1:]
+    letter = chr(int(rng.integers(97, 123)))
+    if op == 2:  # substitution
+        return text[:pos] + letter + text[pos + 1:]
+    return text[:pos] + letter + text[pos:]  # insertion
+
+
+def generate_invoices(
+    n_rows: int,
+    seed: int = 42,
+    typo_rate: float = 0.1,
+    variant_rate: float = 0.2,
+    start: str = "2024-01-01",
+    days: int = 365,
+) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n_hotels = len(HOTEL_BASES) * len(CITIES)
+    hotel_idx = rng.integers(0, n_hotels, n_rows)
+    hotels = np.array([f"{b} {c}" for c in CITIES for b in HOTEL_BASES], dtype=object)
+    addresses = np.array(
+        [f"{(i * 7) % 200 + 1} {STREETS[i % len(STREETS)]}, {CITIES[i // len(HOTEL_BASES)]}" for i in range(n_hotels)],
+        dtype=object,
+    )
+    guest_names = (
+        np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), n_rows)]
+        + " "
+        + np.array(LAST_NAMES, dtype=object)[rng.integers(0, len(LAST_NAMES), n_rows)]
+    )
+    hotel_names = hotels[hotel_idx].copy()
+    for i in np.flatnonzero(rng.random(n_rows) < typo_rate):
+        guest_names[i] = add_typo(rng, guest_names[i])
+    for i in np.flatnonzero(rng.random(n_rows) < variant_rate):
+        hotel_names[i] = _hotel_variant(rng, hotel_names[i])
+
+    check_in = np.datetime64(start, "D") + rng.integers(0, days, n_rows).astype("timedelta64[D]")
+    check_out = check_in + rng.integers(1, 11, n_rows).astype("timedelta64[D]")
+    return pd.DataFrame({
+        "invoice_id": [f"INV-{seed}-{i:09d}" for i in range(n_rows)],
+        "guest_name": guest_names,
+        "hotel_name": hotel_names,
+        "hotel_address": addresses[hotel_idx],
+        "check_in_date": check_in.astype(str),
+        "check_out_date": check_out.astype(str),
+        "notes": np.array(NOTES, dtype=object)[rng.integers(0, len(NOTES), n_rows)],
+    })
+
+
+def generate_match_requests(
+    invoices: pd.DataFrame,
+    n_queries: int,
+    seed: int = 7,
+    date_jitter_days: int = 2,
+) -> List[Tuple[MatchRequest, str]]:
+    # Perturbed copies of indexed invoices, paired with the invoice they should match
+    rng = np.random.default_rng(seed)
+    rows = invoices.iloc[rng.choice(len(invoices), size=min(n_queries, len(invoices)), replace=False)]
+
+    def jitter(day: str) -> str:
+        shift = int(rng.integers(-date_jitter_days, date_jitter_days + 1))
+        return str(np.datetime64(day, "D") + np.timedelta64(shift, "D"))
+
+    out: List[Tuple[MatchRequest, str]] = []
+    for row in rows.to_dict("records"):
+        guest = add_typo(rng, row["guest_name"]) if rng.random() < 0.5 else row["guest_name"]
+        hotel = _hotel_variant(rng, row["hotel_name"])
+        source = {
+            "guest_name": guest,
+            "hotel_name": hotel,
+            "hotel_address": row["hotel_address"],
+            "check_in_date": jitter(row["check_in_date"]),
+            "check_out_date": jitter(row["check_out_date"]),
+        }
+        out.append((MatchRequest(query_text=f"{guest} {hotel}", source_doc=source), row["invoice_id"]))
+    return out
+
+
+class _NoSuchKey(ClientError):
+    pass
+
+
+class _InMemoryS3Exceptions:
+    NoSuchKey = _NoSuchKey
+
+
+class InMemoryS3:
+    # Minimal boto3-compatible stand-in (get_object with ranges, put_object, delete_object, list_objects_v2 paginator)
+    exceptions = _InMemoryS3Exceptions
+
+    def __init__(self):
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.modified: Dict[Tuple[str, str], datetime] = {}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **_) -> Dict:
+        self.objects[(Bucket, Key)] = Body
+        self.modified[(Bucket, Key)] = datetime.utcnow()
+        return {}
+
+    def delete_object(self, Bucket: str, Key: str, **_) -> Dict:
+        self.objects.pop((Bucket, Key), None)
+        self.modified.pop((Bucket, Key), None)
+        return {}
+
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None, **_) -> Dict:
+        body = self.objects.get((Bucket, Key))
+        if body is None:
+            # Same shape as boto3's modeled error, so callers catching s3.exceptions.NoSuchKey
+            # (manifest, index generation) work unchanged
+            raise _NoSuchKey({"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}, "GetObject")
+        if not Range:
+            return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+        # "bytes=a-b" or the suffix form "bytes=-n"
+        first, last = Range.split("=", 1)[1].split("-", 1)
+        if not first:
+            start, end = max(0, len(body) - int(last)), len(body) - 1
+        else:
+            start, end = int(first), min(int(last), len(body) - 1) if last else len(body) - 1
+        part = body[start:end + 1]
+        return {
+            "Body": io.BytesIO(part),
+            "ContentLength": len(part),
+            "ContentRange": f"bytes {start}-{end}/{len(body)}",
+        }
+
+    def get_paginator(self, name: str) -> "InMemoryS3":
+        if name != "list_objects_v2":
+            raise NotImplementedError(name)
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str = "", **_) -> Iterator[Dict]:
+        contents = [
+            {
+                "Key": key,
+                "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+                "LastModified": self.modified[(bucket, key)],
+                "Size": len(body),
+            }
+            for (bucket, key), body in sorted(self.objects.items())
+            if bucket == Bucket and key.startswith(Prefix)
+        ]
+        yield {"Contents": contents}
+
+
+def write_invoices_to_s3(
+    s3_client,
+    invoices: pd.DataFrame,
+    bucket: str,
+    prefix: str,
+    rows_per_object: int = 10000,
+    fmt: str = "csv",
+) -> List[str]:
+    keys: List[str] = []
+    for part, start in enumerate(range(0, len(invoices), rows_per_object)):
+        frame = invoices.iloc[start:start + rows_per_object]
+        key = f"{prefix}part-{part:05d}.{fmt}"
+        if fmt == "parquet":
+            buf = io.BytesIO()
+            frame.to_parquet(buf, index=False)
+            body = buf.getvalue()
+        elif fmt == "json":
+            body = frame.to_json(orient="records").encode("utf-8")
+        elif fmt == "jsonl":
+            body = frame.to_json(orient="records", lines=True).encode("utf-8")
+        else:
+            body = frame.to_csv(index=False).encode("utf-8")
+        s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+        keys.append(key)
+    return keys
@@ -12,6 +12,14 @@ class AwsSettings(BaseModel):
     profile: Optional[str] = Field(default=os.getenv("AWS_PROFILE"))
     s3_bucket: str = Field(default=os.getenv("AWS_S3_BUCKET", ""))
     s3_prefix: str = Field(default=os.getenv("AWS_S3_PREFIX", "invoices/"))
+    s3_max_concurrency: int = Field(default=int(os.getenv("S3_MAX_CONCURRENCY", "8")))
+    s3_prefetch: int = Field(default=int(os.getenv("S3_PREFETCH", "16")))
+    s3_max_retries: int = Field(default=int(os.getenv("S3_MAX_RETRIES", "5")))
+    s3_retry_backoff: float = Field(default=float(os.getenv("S3_RETRY_BACKOFF", "0.5")))
+    # CSV/NDJSON objects are parsed in blocks of this many bytes as they stream in
+    s3_stream_block_size: int = Field(default=int(os.getenv("S3_STREAM_BLOCK_SIZE", str(8 * 1024 * 1024))))
+    # Parquet is read with ranged GETs; the first GET fetches this much of the file tail (footer)
+    s3_parquet_tail_bytes: int = Field(default=int(os.getenv("S3_PARQUET_TAIL_BYTES", str(1024 * 1024))))
 
 
 class OpenSearchSettings(BaseModel):
@@ -20,6 +28,22 @@ class OpenSearchSettings(BaseModel):
     username: str = Field(default=os.getenv("OPENSEARCH_USER", ""))
     password: str = Field(default=os.getenv("OPENSEARCH_PASSWORD", ""))
     index_name: str = Field(default=os.getenv("OPENSEARCH_INDEX", "invoices"))
+    pool_maxsize: int = Field(default=int(os.getenv("OPENSEARCH_POOL_MAXSIZE", "25")))
+    timeout: int = Field(default=int(os.getenv("OPENSEARCH_TIMEOUT", "60")))
+    max_retries: int = Field(default=int(os.getenv("OPENSEARCH_MAX_RETRIES", "3")))
+    retry_on_timeout: bool = Field(default=os.getenv("OPENSEARCH_RETRY_ON_TIMEOUT", "true").lower() == "true")
+    # "opensearch" talks to the cluster; "local" uses the embedded LocalBM25Index
+    backend: str = Field(default=os.getenv("OPENSEARCH_BACKEND", "opensearch"))
+    local_path: str = Field(default=os.getenv("OPENSEARCH_LOCAL_PATH", ".bm25_index"))
+    # Bulk loading: chunks are capped by action count and bytes and sent by parallel threads;
+    # items rejected with 429 are retried with exponential backoff
+    bulk_chunk_size: int = Field(default=int(os.getenv("OPENSEARCH_BULK_CHUNK_SIZE", "500")))
+    bulk_max_bytes: int = Field(default=int(os.getenv("OPENSEARCH_BULK_MAX_BYTES", str(10 * 1024 * 1024))))
+    bulk_threads: int = Field(default=int(os.getenv("OPENSEARCH_BULK_THREADS", "4")))
+    bulk_max_retries: int = Field(default=int(os.getenv("OPENSEARCH_BULK_MAX_RETRIES", "5")))
+    bulk_initial_backoff: float = Field(default=float(os.getenv("OPENSEARCH_BULK_INITIAL_BACKOFF", "1.0")))
+    bulk_max_backoff: float = Field(default=float(os.getenv("OPENSEARCH_BULK_MAX_BACKOFF", "30.0")))
+    bulk_raise_on_error: bool = Field(default=os.getenv("OPENSEARCH_BULK_RAISE_ON_ERROR", "true").lower() == "true")
 
 
 class QdrantSettings(BaseModel):
@@ -27,11 +51,47 @@ class QdrantSettings(BaseModel):
     port: int = Field(default=int(os.getenv("QDRANT_PORT", "6333")))
     collection_name: str = Field(default=os.getenv("QDRANT_COLLECTION", "invoices_vectors"))
     use_https: bool = Field(default=os.getenv("QDRANT_USE_HTTPS", "false").lower() == "true")
+    grpc_port: int = Field(default=int(os.getenv("QDRANT_GRPC_PORT", "6334")))
+    prefer_grpc: bool = Field(default=os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true")
+    timeout: int = Field(default=int(os.getenv("QDRANT_TIMEOUT", "30")))
+    pool_maxsize: int = Field(default=int(os.getenv("QDRANT_POOL_MAXSIZE", "25")))
+    max_retries: int = Field(default=int(os.getenv("QDRANT_MAX_RETRIES", "3")))
+    vector_cache_size: int = Field(default=int(os.getenv("QDRANT_VECTOR_CACHE_SIZE", "0")))
+    # "qdrant" talks to the server; "local" uses the embedded LocalVectorIndex
+    backend: str = Field(default=os.getenv("QDRANT_BACKEND", "qdrant"))
+    local_path: str = Field(default=os.getenv("QDRANT_LOCAL_PATH", ".vector_index"))
+    local_ivf_lists: int = Field(default=int(os.getenv("QDRANT_LOCAL_IVF_LISTS", "0")))
+    local_ivf_probe: int = Field(default=int(os.getenv("QDRANT_LOCAL_IVF_PROBE", "8")))
+    # none | scalar (int8) | binary; originals stay available for rescoring
+    quantization: str = Field(default=os.getenv("QDRANT_QUANTIZATION", "none"))
+    quantization_quantile: float = Field(default=float(os.getenv("QDRANT_QUANTIZATION_QUANTILE", "0.99")))
+    quantization_always_ram: bool = Field(default=os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true").lower() == "true")
+    oversampling: float = Field(default=float(os.getenv("QDRANT_OVERSAMPLING", "2.0")))
+    rescore: bool = Field(default=os.getenv("QDRANT_RESCORE", "true").lower() == "true")
+    on_disk: bool = Field(default=os.getenv("QDRANT_ON_DISK", "false").lower() == "true")
+    hnsw_m: int = Field(default=int(os.getenv("QDRANT_HNSW_M", "16")))
+    hnsw_ef_construct: int = Field(default=int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100")))
+    hnsw_ef: int = Field(default=int(os.getenv("QDRANT_HNSW_EF", "0")))  # 0 = server default
+    upsert_batch_size: int = Field(default=int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256")))
+    upsert_parallel: int = Field(default=int(os.getenv("QDRANT_UPSERT_PARALLEL", "1")))
+    # Payload fields stored with each vector ("*" keeps the whole document); check_in_ts and
+    # check_out_ts are always added for date-range filtering
+    payload_fields: str = Field(default=os.getenv("QDRANT_PAYLOAD_FIELDS", "invoice_id,hotel_name,check_in_date,check_out_date"))
 
 
 class EmbeddingSettings(BaseModel):
     model_name: str = Field(default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
     dimension: int = Field(default=int(os.getenv("EMBEDDING_DIM", "384")))
+    cache_enabled: bool = Field(default=os.getenv("EMBEDDING_CACHE", "false").lower() == "true")
+    cache_dir: str = Field(default=os.getenv("EMBEDDING_CACHE_DIR", ""))
+    cache_max_items: int = Field(default=int(os.getenv("EMBEDDING_CACHE_MAX_ITEMS", "100000")))
+    batch_size: int = Field(default=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+    # torch | int8 (dynamically quantized Linear layers) | onnx (needs optimum[onnxruntime])
+    backend: str = Field(default=os.getenv("EMBEDDING_BACKEND", "torch"))
+    # > 1 encodes large batches on a pool of worker processes, one model copy each
+    workers: int = Field(default=int(os.getenv("EMBEDDING_WORKERS", "0")))
+    # Smaller calls (e.g. match queries) stay in-process
+    pool_min_texts: int = Field(default=int(os.getenv("EMBEDDING_POOL_MIN_TEXTS", "512")))
 
 
 class PipelineSettings(BaseModel):
@@ -39,6 +99,38 @@ class PipelineSettings(BaseModel):
     top_k_vector: int = Field(default=int(os.getenv("TOP_K_VECTOR", "50")))
     blend_alpha: float = Field(default=float(os.getenv("BLEND_ALPHA", "0.6")))
     date_window_days: int = Field(default=int(os.getenv("DATE_WINDOW_DAYS", "7")))
+    top_n_results: int = Field(default=int(os.getenv("MATCH_TOP_N", "0")))
+    # "global": independent top-k vector search; "candidates": score exactly the BM25 candidates
+    vector_mode: str = Field(default=os.getenv("VECTOR_MODE", "global"))
+    match_batch_size: int = Field(default=int(os.getenv("MATCH_BATCH_SIZE", "256")))
+    match_concurrency: int = Field(default=int(os.getenv("MATCH_CONCURRENCY", "32")))
+    index_streaming: bool = Field(default=os.getenv("INDEX_STREAMING", "false").lower() == "true")
+    index_chunk_size: int = Field(default=int(os.getenv("INDEX_CHUNK_SIZE", "5000")))
+    index_incremental: bool = Field(default=os.getenv("INDEX_INCREMENTAL", "false").lower() == "true")
+    # Only index invoices with check_in >= INDEX_DATE_FROM and check_out <= INDEX_DATE_TO
+    index_date_from: Optional[str] = Field(default=os.getenv("INDEX_DATE_FROM") or None)
+    index_date_to: Optional[str] = Field(default=os.getenv("INDEX_DATE_TO") or None)
+    manifest_path: str = Field(default=os.getenv("INDEX_MANIFEST_PATH", ".index_manifest.json"))
+    # Parallel index tasks in the DAGs; S3 objects are split into shards balanced by size
+    index_shard_count: int = Field(default=int(os.getenv("INDEX_SHARD_COUNT", "4")))
+    # Disables refresh and replicas while loading, then restores them and refreshes once
+    index_fast_load: bool = Field(default=os.getenv("INDEX_FAST_LOAD", "false").lower() == "true")
+    # Bumped by every index run; cached match results from older generations are dropped
+    index_generation_path: str = Field(default=os.getenv("INDEX_GENERATION_PATH", ".index_generation.json"))
+    index_generation_poll_seconds: float = Field(default=float(os.getenv("INDEX_GENERATION_POLL_SECONDS", "1.0")))
+    match_cache_enabled: bool = Field(default=os.getenv("MATCH_CACHE_ENABLED", "false").lower() == "true")
+    match_cache_max_items: int = Field(default=int(os.getenv("MATCH_CACHE_MAX_ITEMS", "10000")))
+    match_cache_ttl_seconds: float = Field(default=float(os.getenv("MATCH_CACHE_TTL_SECONDS", "3600")))
+    # Match export: invoices under MATCH_SOURCE_PREFIX are matched in chunks and the top-N
+    # candidates written as Parquet partitioned by check-in month (local path or s3://)
+    match_source_prefix: str = Field(default=os.getenv("MATCH_SOURCE_PREFIX", ""))
+    match_output_path: str = Field(default=os.getenv("MATCH_OUTPUT_PATH", "match_output"))
+    match_checkpoint_path: str = Field(default=os.getenv("MATCH_CHECKPOINT_PATH", ""))  # default: <output>/_checkpoint.json
+    match_export_chunk_size: int = Field(default=int(os.getenv("MATCH_EXPORT_CHUNK_SIZE", "2000")))
+    match_export_workers: int = Field(default=int(os.getenv("MATCH_EXPORT_WORKERS", "4")))
+    match_export_top_n: int = Field(default=int(os.getenv("MATCH_EXPORT_TOP_N", "5")))  # 0 = all candidates
+    reconcile_workers: int = Field(default=int(os.getenv("RECONCILE_WORKERS", "0")))  # 0 = one per CPU
+    reconcile_guest_key: str = Field(default=os.getenv("RECONCILE_GUEST_KEY", "soundex"))  # soundex | prefix | none
 
 
 class LoggingSettings(BaseModel):
@@ -46,6 +138,24 @@ class LoggingSettings(BaseModel):
     json: bool = Field(default=os.getenv("LOG_JSON", "false").lower() == "true")
 
 
+class MetricsSettings(BaseModel):
+    enabled: bool = Field(default=os.getenv("METRICS_ENABLED", "false").lower() == "true")
+    prometheus_path: str = Field(default=os.getenv("METRICS_PROMETHEUS_PATH", ""))
+    jsonl_path: str = Field(default=os.getenv("METRICS_JSONL_PATH", ""))
+
+
+class ServerSettings(BaseModel):
+    host: str = Field(default=os.getenv("MATCH_SERVER_HOST", "0.0.0.0"))
+    port: int = Field(default=int(os.getenv("MATCH_SERVER_PORT", "8080")))
+    # Requests arriving within max_wait_ms are matched together, up to max_batch_size
+    max_batch_size: int = Field(default=int(os.getenv("MATCH_SERVER_MAX_BATCH_SIZE", "64")))
+    max_wait_ms: float = Field(default=float(os.getenv("MATCH_SERVER_MAX_WAIT_MS", "5")))
+    # Batches in flight at once; requests waiting beyond max_pending are rejected (503)
+    concurrency: int = Field(default=int(os.getenv("MATCH_SERVER_CONCURRENCY", "4")))
+    max_pending: int = Field(default=int(os.getenv("MATCH_SERVER_MAX_PENDING", "1024")))
+    warm_up: bool = Field(default=os.getenv("MATCH_SERVER_WARM_UP", "true").lower() == "true")
+
+
 class Settings(BaseModel):
     aws: AwsSettings = Field(default_factory=AwsSettings)
     opensearch: OpenSearchSettings = Field(default_factory=OpenSearchSettings)
@@ -53,6 +163,8 @@ class Settings(BaseModel):
     embed: EmbeddingSettings = Field(default_factory=EmbeddingSettings)
     pipeline: PipelineSettings = Field(default_factory=PipelineSettings)
     logging: LoggingSettings = Field(default_factory=LoggingSettings)
+    metrics: MetricsSettings = Field(default_factory=MetricsSettings)
+    server: ServerSettings = Field(default_factory=ServerSettings)
 
 
 @lru_cache(maxsize=1)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def length_sorted_order(sentences: List[str]) -> np.ndarray:
+    # Longest first, so each batch pads to similar lengths
+    return np.argsort([-len(s) for s in sentences], kind="stable")
+
+
+def _model_config(model_name: str, filename: str) -> Optional[Dict[str, Any]]:
+    # A sentence-transformers config file from a local model dir or the hub cache
+    try:
+        if os.path.isdir(model_name):
+            path = os.path.join(model_name, filename)
+        else:
+            from huggingface_hub import hf_hub_download
+
+            path = hf_hub_download(model_name, filename)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+class OnnxSentenceEncoder:
+    # ONNX Runtime export of a mean-pooling sentence-transformers model with the
+    # SentenceTransformer.encode call shape. Needs the optional `optimum[onnxruntime]`.
+    def __init__(self, model_name: str, max_length: Optional[int] = None):
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError as exc:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires `pip install optimum[onnxruntime]`") from exc
+        pooling = _model_config(model_name, "1_Pooling/config.json")
+        if pooling is not None and not pooling.get("pooling_mode_mean_tokens", False):
+            raise ValueError(f"EMBEDDING_BACKEND=onnx only supports mean-pooling models; {model_name} is not one")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        # Truncate where SentenceTransformer would, so vectors match the torch backend
+        sentence_config = _model_config(model_name, "sentence_bert_config.json") or {}
+        self.max_length = max_length or sentence_config.get("max_seq_length") or min(self.tokenizer.model_max_length, 512)
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        **_,
+    ) -> np.ndarray:
+        order = length_sorted_order(sentences)
+        out: Optional[np.ndarray] = None
+        for start in range(0, len(sentences), batch_size):
+            idx = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            hidden = self.model(**tokens).last_hidden_state
+            hidden = np.asarray(hidden, dtype=np.float32)
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if out is None:
+                out = np.empty((len(sentences), pooled.shape[1]), dtype=np.float32)
+            out[idx] = pooled
+        if out is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out /= np.clip(norms, 1e-12, None)
+        return out
+
+
+def load_model(model_name: str, backend: str = "torch"):
+    # Every backend exposes encode(sentences, batch_size=, convert_to_numpy=, normalize_embeddings=).
+    # sentence_transformers (and torch) are imported here, on first model load.
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "int8":
+        # Dynamic int8 quantization of the Linear layers; CPU only
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        return OnnxSentenceEncoder(model_name)
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:  # POSIX only; on other platforms concurrent writers are not serialized
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+class _DiskVectorStore:
+    # Append-only float32 vector file (memory-mapped for reads) plus a key sidecar whose
+    # line number is the row index. Vectors are written before their keys so readers in
+    # other processes never see a key without its vector.
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.keys_path = os.path.join(directory, "keys.txt")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, ".lock")
+        self.dimension: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        self._rows = 0
+        self._keys_offset = 0
+        self._mmap: Optional[np.memmap] = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dimension = int(json.load(f)["dimension"])
+
+    def _locked(self):
+        return _FileLock(self.lock_path)
+
+    def refresh(self) -> None:
+        if not os.path.exists(self.keys_path):
+            return
+        if self.dimension is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dimension = int(json.load(f)["dimension"])
+        if os.path.getsize(self.keys_path) == self._keys_offset:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written line from a concurrent writer
+                # Counted per line, not per distinct key, so a repeated key can't shift later rows
+                self._index.setdefault(line[:-1].decode("ascii"), self._rows)
+                self._rows += 1
+                self._keys_offset += len(line)
+        self._mmap = None
+
+    def _vectors(self) -> Optional[np.memmap]:
+        if self._mmap is None and self._rows and self.dimension:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dimension))
+        return self._mmap
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._index.get(key)
+        if row is None:
+            return None
+        vectors = self._vectors()
+        return None if vectors is None else np.array(vectors[row])
+
+    def append(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        if not len(keys):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._locked():
+            self.refresh()
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dimension": self.dimension}, f)
+            if vectors.shape[1] != self.dimension:
+                return
+            # A row is only valid once its key is written; drop rows left behind by a writer
+            # that died between the two writes, so rows and key lines stay aligned
+            expected = self._rows * self.dimension * 4
+            if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > expected:
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(expected)
+                self._mmap = None
+            new_rows: List[int] = []
+            seen = set(self._index)
+            for i, k in enumerate(keys):
+                if k not in seen:
+                    seen.add(k)
+                    new_rows.append(i)
+            if not new_rows:
+                return
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[new_rows].tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write("".join(f"{keys[i]}\n" for i in new_rows).encode("ascii"))
+            self.refresh()
+
+
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        self._fh.close()
+        return False
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        max_memory_items: int = 100_000,
+        backend: str = "torch",
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        # int8/onnx vectors differ slightly from fp32 ones, so each backend gets its own keys
+        # and directory; torch keeps the original ones so existing caches stay valid
+        self._identity = model_name if backend == "torch" else f"{model_name}\x1f{backend}"
+        self.max_memory_items = max_memory_items
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskVectorStore] = None
+        if cache_dir:
+            model_dir = hashlib.sha1(self._identity.encode("utf-8")).hexdigest()[:16]
+            self._disk = _DiskVectorStore(os.path.join(cache_dir, model_dir))
+
+    def key(self, text: str, normalize: bool = True) -> str:
+        raw = f"{self._identity}\x1f{int(normalize)}\x1f{text}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        out: List[Optional[np.ndarray]] = []
+        with self._lock:
+            if self._disk is not None:
+                self._disk.refresh()
+            for k in keys:
+                vec = self._memory.get(k)
+                if vec is not None:
+                    self._memory.move_to_end(k)
+                elif self._disk is not None:
+                    vec = self._disk.get(k)
+                    if vec is not None:
+                        self._remember(k, vec)
+                if vec is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                out.append(vec)
+        return out
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            for k, vec in zip(keys, vectors):
+                self._remember(k, np.array(vec, dtype=np.float32))
+            if self._disk is not None:
+                self._disk.append(keys, vectors)
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "memory_items": len(self._memory)}
@@ -1,23 +1,101 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Optional
+import time
+from typing import Dict, Iterable, List, Optional
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 from ai_finance.config import get_settings
+from ai_finance.embedding.cache import EmbeddingCache
+from ai_finance.embedding.pool import EncodePool
+from ai_finance.embedding.registry import get_model_registry
+from ai_finance.metrics import get_metrics
 
 
 class EmbeddingEncoder:
-    def __init__(self, model_name: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
         settings = get_settings()
         self.model_name = model_name or settings.embed.model_name
-        self.model = SentenceTransformer(self.model_name)
+        self.backend = backend or settings.embed.backend
+        self.batch_size = max(1, batch_size or settings.embed.batch_size)
+        self.workers = settings.embed.workers if workers is None else workers
+        self._pool: Optional[EncodePool] = None
+        self.texts_encoded = 0
+        self.encode_seconds = 0.0
         self.dimension = settings.embed.dimension
+        # The default cache is shared per model, like the model itself
+        self.cache = cache if cache is not None else get_model_registry().get_cache(self.model_name, self.backend)
+
+    @property
+    def model(self):
+        # Loaded (once per process) on first use; dimension comes from settings
+        return get_model_registry().get_model(self.model_name, self.backend)
+
+    def _encode_model(self, sentences: List[str], normalize: bool) -> np.ndarray:
+        started = time.perf_counter()
+        if self.workers > 1 and len(sentences) >= get_settings().embed.pool_min_texts:
+            if self._pool is None:
+                self._pool = EncodePool(self.model_name, self.backend, self.workers)
+            vectors = self._pool.encode(sentences, self.batch_size, normalize)
+        else:
+            vectors = self.model.encode(
+                sentences,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=normalize,
+            )
+        elapsed = time.perf_counter() - started
+        self.texts_encoded += len(sentences)
+        self.encode_seconds += elapsed
+        metrics = get_metrics()
+        metrics.inc("embedding_texts_total", len(sentences), backend=self.backend)
+        metrics.observe("embedding_encode_seconds", elapsed, backend=self.backend)
+        return vectors
+
+    def throughput(self) -> Dict[str, float]:
+        # Model encodes since construction; cache hits are not counted
+        return {
+            "texts": self.texts_encoded,
+            "seconds": self.encode_seconds,
+            "texts_per_s": self.texts_encoded / self.encode_seconds if self.encode_seconds else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def encode(self, texts: Iterable[str], normalize: bool = True) -> np.ndarray:
         sentences: List[str] = [t if t is not None else "" for t in texts]
-        vectors = self.model.encode(sentences, convert_to_numpy=True, normalize_embeddings=normalize)
-        return vectors
+        if self.cache is None or not sentences:
+            return self._encode_model(sentences, normalize)
 
+        keys = [self.cache.key(s, normalize) for s in sentences]
+        cached = self.cache.get_many(keys)
+        # All misses (deduplicated) are encoded together in one batch
+        missing: Dict[str, int] = {}
+        for i, vec in enumerate(cached):
+            if vec is None and keys[i] not in missing:
+                missing[keys[i]] = i
+        if missing:
+            miss_keys = list(missing)
+            miss_vectors = self._encode_model([sentences[missing[k]] for k in miss_keys], normalize)
+            self.cache.put_many(miss_keys, miss_vectors)
+            encoded = {k: miss_vectors[j] for j, k in enumerate(miss_keys)}
+        else:
+            encoded = {}
+        dim = len(cached[0]) if cached[0] is not None else len(next(iter(encoded.values())))
+        vectors = np.empty((len(sentences), dim), dtype=np.float32)
+        for i, vec in enumerate(cached):
+            vectors[i] = vec if vec is not None else encoded[keys[i]]
+        return vectors
 
+    def cache_stats(self) -> Dict[str, int]:
+        return self.cache.stats() if self.cache is not None else {}
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ai_finance.embedding.backends import length_sorted_order, load_model
+
+_worker_model = None
+
+
+def _init_worker(model_name: str, backend: str, threads: int) -> None:
+    # Splits the cores between workers instead of every worker using all of them
+    global _worker_model
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = load_model(model_name, backend)
+
+
+def _encode_chunk(args: Tuple[List[str], int, bool]) -> np.ndarray:
+    sentences, batch_size, normalize = args
+    return np.asarray(
+        _worker_model.encode(sentences, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=normalize),
+        dtype=np.float32,
+    )
+
+
+class EncodePool:
+    # Multi-process CPU encoding. Each spawned worker loads the model once; inputs are
+    # sorted by length and cut into contiguous chunks, so batches inside a chunk pad to
+    # similar lengths, and the results are put back in input order.
+    def __init__(self, model_name: str, backend: str, workers: int, threads_per_worker: Optional[int] = None):
+        self.workers = max(1, workers)
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, backend, threads),
+        )
+
+    def encode(self, sentences: List[str], batch_size: int, normalize: bool) -> np.ndarray:
+        order = length_sorted_order(sentences)
+        # A few chunks per worker keeps the pool busy when chunk costs differ
+        per_chunk = max(batch_size, math.ceil(len(sentences) / (self.workers * 4)))
+        per_chunk = math.ceil(per_chunk / batch_size) * batch_size
+        chunks = [
+            ([sentences[i] for i in order[start:start + per_chunk]], batch_size, normalize)
+            for start in range(0, len(sentences), per_chunk)
+        ]
+        parts = list(self._executor.map(_encode_chunk, chunks))
+        vectors = np.concatenate(parts) if parts else np.empty((0, 0), dtype=np.float32)
+        out = np.empty_like(vectors)
+        out[order] = vectors
+        return out
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
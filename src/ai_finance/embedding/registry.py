@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ai_finance.config import get_settings
+from ai_finance.embedding.backends import load_model
+from ai_finance.embedding.cache import EmbeddingCache
+from ai_finance.metrics import get_metrics
+from ai_finance.pooling import ProcessLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    # Process-wide models and default embedding caches, keyed by (model_name, backend).
+    # Every EmbeddingEncoder in the process shares them, so a per-request encoder costs
+    # nothing and each model is loaded once, on first encode.
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._caches: Dict[Tuple[str, str], EmbeddingCache] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get_model(self, model_name: str, backend: str) -> Any:
+        key = (model_name, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        # Loads of different models don't wait on each other
+        with load_lock:
+            model = self._models.get(key)
+            if model is None:
+                started = time.perf_counter()
+                model = load_model(model_name, backend)
+                elapsed = time.perf_counter() - started
+                get_metrics().observe("embedding_model_load_seconds", elapsed, backend=backend)
+                logger.info("Loaded embedding model %s (%s) in %.2fs", model_name, backend, elapsed)
+                self._models[key] = model
+        return model
+
+    def get_cache(self, model_name: str, backend: str = "torch") -> Optional[EmbeddingCache]:
+        settings = get_settings()
+        if not settings.embed.cache_enabled:
+            return None
+        with self._lock:
+            cache = self._caches.get((model_name, backend))
+            if cache is None:
+                cache = EmbeddingCache(
+                    model_name,
+                    cache_dir=settings.embed.cache_dir or None,
+                    max_memory_items=settings.embed.cache_max_items,
+                    backend=backend,
+                )
+                self._caches[(model_name, backend)] = cache
+            return cache
+
+    def loaded(self) -> Dict[Tuple[str, str], Any]:
+        return dict(self._models)
+
+
+_registry: ProcessLocal[ModelRegistry] = ProcessLocal(ModelRegistry)
+
+
+def get_model_registry() -> ModelRegistry:
+    return _registry.get()
+
+
+def get_embedding_dimension() -> int:
+    # Collection and index setup only need the configured size, not a loaded model
+    return get_settings().embed.dimension
+
+
+def warm_up(model_name: Optional[str] = None, backend: Optional[str] = None) -> float:
+    # Optional hook for long-running workers (match servers, Airflow workers): loads the
+    # model and runs one encode so the first request doesn't pay for lazy initialization.
+    settings = get_settings()
+    started = time.perf_counter()
+    model = get_model_registry().get_model(model_name or settings.embed.model_name, backend or settings.embed.backend)
+    model.encode(["warm up"], batch_size=1, convert_to_numpy=True, normalize_embeddings=True)
+    return time.perf_counter() - started
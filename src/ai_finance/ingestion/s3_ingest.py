@@ -1,17 +1,41 @@
 from __future__ import annotations
 
+import csv
 import io
+import json
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable, List, Optional
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import boto3
+import numpy as np
 import pandas as pd
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
 
 from ai_finance.config import get_settings
+from ai_finance.metrics import get_metrics
+from ai_finance.pooling import ProcessLocal
+
+
+REQUIRED_COLUMNS = [
+    "invoice_id",
+    "guest_name",
+    "hotel_name",
+    "hotel_address",
+    "check_in_date",
+    "check_out_date",
+    "notes",
+]
 
 
 @dataclass
 class InvoiceRecord:
+    # Slotted: no per-record __dict__
+    __slots__ = ("invoice_id", "guest_name", "hotel_name", "hotel_address", "check_in_date", "check_out_date", "notes")
+
     invoice_id: str
     guest_name: Optional[str]
     hotel_name: Optional[str]
@@ -21,9 +45,222 @@ class InvoiceRecord:
     notes: Optional[str]
 
 
-def _read_object_to_dataframe(s3_client, bucket: str, key: str) -> pd.DataFrame:
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    body = obj["Body"].read()
+def _create_s3_client():
+    settings = get_settings()
+    session = boto3.Session(profile_name=settings.aws.profile) if settings.aws.profile else boto3.Session()
+    return session.client(
+        "s3",
+        region_name=settings.aws.region,
+        # Prefetched CSV/JSON streams each hold a connection until the consumer reaches them
+        config=Config(max_pool_connections=max(10, settings.aws.s3_max_concurrency + settings.aws.s3_prefetch)),
+    )
+
+
+_s3_client = ProcessLocal(_create_s3_client)
+
+
+def get_s3_client():
+    # boto3 clients are thread-safe; one client (and connection pool) is shared by all fetch workers
+    return _s3_client.get()
+
+
+def reset_s3_client() -> None:
+    _s3_client.reset()
+
+
+def set_s3_client(client) -> None:
+    # Installs a preconfigured client (e.g. moto or a local stand-in) for this process
+    _s3_client.set(client)
+
+
+_NON_RETRYABLE_CODES = {"NoSuchKey", "NoSuchBucket", "AccessDenied", "PreconditionFailed", "404", "403", "412"}
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") not in _NON_RETRYABLE_CODES
+    return isinstance(exc, (BotoCoreError, OSError))
+
+
+def _retrying() -> Retrying:
+    settings = get_settings()
+    return Retrying(
+        stop=stop_after_attempt(max(1, settings.aws.s3_max_retries)),
+        wait=wait_exponential(multiplier=settings.aws.s3_retry_backoff, max=30),
+        retry=retry_if_exception(_is_retryable),
+        reraise=True,
+    )
+
+
+def _get_object_bytes(s3_client, bucket: str, key: str) -> bytes:
+    metrics = get_metrics()
+    with metrics.span("index_stage", stage="s3_download"):
+        for attempt in _retrying():
+            with attempt:
+                obj = s3_client.get_object(Bucket=bucket, Key=key)
+                body = obj["Body"].read()
+                break
+    metrics.inc("s3_objects_total")
+    metrics.inc("s3_bytes_total", len(body))
+    return body
+
+
+class _BodyReader(io.RawIOBase):
+    # Raw-IO view of a streaming GetObject body that reports transferred bytes. A read
+    # that fails mid-body is retried by reopening the object at the first unread byte,
+    # pinned to the ETag of the first response so a replaced object is not spliced in.
+    def __init__(self, s3_client, bucket: str, key: str):
+        self._s3 = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._body = None
+        self._etag: Optional[str] = None
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def open(self) -> None:
+        kwargs: Dict[str, Any] = {}
+        if self._pos:
+            kwargs["Range"] = f"bytes={self._pos}-"
+            if self._etag:
+                kwargs["IfMatch"] = self._etag
+        resp = self._s3.get_object(Bucket=self._bucket, Key=self._key, **kwargs)
+        self._etag = self._etag or resp.get("ETag")
+        self._body = resp["Body"]
+
+    def _discard(self) -> None:
+        body, self._body = self._body, None
+        close = getattr(body, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception:  # the connection is already broken
+                pass
+
+    def readinto(self, buffer) -> int:
+        for attempt in _retrying():
+            with attempt:
+                if self._body is None:
+                    self.open()
+                try:
+                    data = self._body.read(len(buffer))
+                except Exception:
+                    self._discard()
+                    raise
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        get_metrics().inc("s3_bytes_total", len(data))
+        return len(data)
+
+    def close(self) -> None:
+        self._discard()
+        super().close()
+
+
+class _S3RangeFile(io.RawIOBase):
+    # Seekable read-only S3 object where every read is a ranged GET. Parquet readers fetch
+    # the footer from the cached tail and then only the column chunks they decode.
+    def __init__(self, s3_client, bucket: str, key: str, tail_bytes: int):
+        self._s3 = s3_client
+        self._bucket = bucket
+        self._key = key
+        for attempt in _retrying():
+            with attempt:
+                resp = self._get(f"bytes=-{max(1, tail_bytes)}")
+                self._tail = resp["Body"].read()
+        content_range = resp.get("ContentRange")
+        self.size = int(content_range.rsplit("/", 1)[1]) if content_range else len(self._tail)
+        self._tail_start = self.size - len(self._tail)
+        self._pos = 0
+        get_metrics().inc("s3_bytes_total", len(self._tail))
+
+    def _get(self, byte_range: str) -> Dict[str, Any]:
+        # Not retried here: callers retry the GET together with the body read
+        return self._s3.get_object(Bucket=self._bucket, Key=self._key, Range=byte_range)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self.size - self._pos)
+        if n <= 0:
+            return 0
+        if self._pos >= self._tail_start:
+            offset = self._pos - self._tail_start
+            data = self._tail[offset: offset + n]
+        else:
+            for attempt in _retrying():
+                with attempt:
+                    data = self._get(f"bytes={self._pos}-{self._pos + n - 1}")["Body"].read()
+            get_metrics().inc("s3_bytes_total", len(data))
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def _column_map(names: Iterable[str]) -> Dict[str, str]:
+    # Source column name for each REQUIRED_COLUMNS field, matched like normalize_columns
+    found: Dict[str, str] = {}
+    for name in names:
+        canonical = str(name).strip().lower()
+        if canonical in REQUIRED_COLUMNS and canonical not in found:
+            found[canonical] = name
+    return found
+
+
+def _project(table) -> pd.DataFrame:
+    # Required columns only, as strings (no date/number inference), under their canonical names
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    found = _column_map(table.column_names)
+    columns = {c: found[c] for c in REQUIRED_COLUMNS if c in found}
+    arrays = []
+    for name in columns.values():
+        column = table.column(name)
+        if pa.types.is_timestamp(column.type) or pa.types.is_date(column.type):
+            # A plain cast gives "2024-01-02 00:00:00.000000", which the index date format rejects
+            column = pc.strftime(column, format="%Y-%m-%d")
+        elif not pa.types.is_string(column.type):
+            column = column.cast(pa.string())
+        arrays.append(column)
+    return pa.table(arrays, names=list(columns)).to_pandas()
+
+
+def filter_by_dates(frame: pd.DataFrame, date_from: Optional[str], date_to: Optional[str]) -> pd.DataFrame:
+    # Row-level check_in >= date_from / check_out <= date_to, the same semantics as the
+    # search filters: rows without the date are dropped when the bound is set.
+    if frame.empty or not (date_from or date_to):
+        return frame
+    keep = pd.Series(True, index=frame.index)
+    if date_from:
+        check_in = pd.to_datetime(frame.get("check_in_date"), errors="coerce")
+        keep &= check_in >= pd.Timestamp(date_from)
+    if date_to:
+        check_out = pd.to_datetime(frame.get("check_out_date"), errors="coerce")
+        keep &= check_out <= pd.Timestamp(date_to)
+    return frame[keep.to_numpy()].reset_index(drop=True)
+
+
+def _parse_bytes_to_dataframe(body: bytes, key: str) -> pd.DataFrame:
+    with get_metrics().span("index_stage", stage="parse"):
+        return _parse_bytes(body, key)
+
+
+def _parse_bytes(body: bytes, key: str) -> pd.DataFrame:
     if key.lower().endswith(".csv"):
         return pd.read_csv(io.BytesIO(body))
     if key.lower().endswith(".json"):
@@ -33,59 +270,360 @@ def _read_object_to_dataframe(s3_client, bucket: str, key: str) -> pd.DataFrame:
     raise ValueError(f"Unsupported file type for key: {key}")
 
 
-def list_s3_keys(prefix: Optional[str] = None) -> List[str]:
+def _read_object_to_dataframe(s3_client, bucket: str, key: str) -> pd.DataFrame:
+    return _parse_bytes_to_dataframe(_get_object_bytes(s3_client, bucket, key), key)
+
+
+def _open_stream(s3_client, bucket: str, key: str, block_size: int) -> io.BufferedReader:
+    metrics = get_metrics()
+    with metrics.span("index_stage", stage="s3_download"):
+        raw = _BodyReader(s3_client, bucket, key)
+        for attempt in _retrying():
+            with attempt:
+                raw.open()
+    metrics.inc("s3_objects_total")
+    return io.BufferedReader(raw, buffer_size=block_size)
+
+
+def _csv_header(stream: io.BufferedReader) -> Optional[List[str]]:
+    head = stream.peek(1)
+    newline = head.find(b"\n")
+    if newline < 0:
+        return None
+    line = head[:newline].decode("utf-8-sig", errors="replace")
+    return next(csv.reader([line]), None)
+
+
+def _iter_csv_batches(stream: io.BufferedReader, block_size: int) -> Iterator[pd.DataFrame]:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    header = _csv_header(stream)
+    convert = pa_csv.ConvertOptions(strings_can_be_null=True)
+    if header is not None:
+        columns = _column_map(header)
+        convert = pa_csv.ConvertOptions(
+            include_columns=list(columns.values()),
+            column_types={name: pa.string() for name in columns.values()},
+            strings_can_be_null=True,
+        )
+    metrics = get_metrics()
+    with stream:
+        with metrics.span("index_stage", stage="parse"):
+            reader = pa_csv.open_csv(stream, read_options=pa_csv.ReadOptions(block_size=block_size), convert_options=convert)
+        while True:
+            with metrics.span("index_stage", stage="parse"):
+                try:
+                    batch = reader.read_next_batch()
+                except StopIteration:
+                    return
+                frame = _project(pa.Table.from_batches([batch]))
+            yield frame
+
+
+def _iter_ndjson_batches(stream: io.BufferedReader, block_size: int) -> Iterator[pd.DataFrame]:
+    # Newline-aligned blocks parsed one at a time; date fields stay strings
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+
+    options = pa_json.ParseOptions(
+        explicit_schema=pa.schema([(c, pa.string()) for c in ("check_in_date", "check_out_date")]),
+        unexpected_field_behavior="infer",
+    )
+    metrics = get_metrics()
+    carry = b""
+    with stream:
+        while True:
+            chunk = stream.read(block_size)
+            block = carry + chunk
+            if chunk:
+                cut = block.rfind(b"\n") + 1
+                block, carry = block[:cut], block[cut:]
+            if block.strip():
+                with metrics.span("index_stage", stage="parse"):
+                    try:
+                        frame = _project(pa_json.read_json(io.BytesIO(block), parse_options=options))
+                    except pa.ArrowInvalid:
+                        # Mixed value types in a column: let pandas coerce this block
+                        frame = normalize_columns(pd.read_json(io.BytesIO(block), lines=True, dtype=False))
+                        frame = frame[REQUIRED_COLUMNS]
+                yield frame
+            if not chunk:
+                return
+
+
+def _row_group_in_range(pf, row_group: int, columns: Dict[str, str], date_from: Optional[str], date_to: Optional[str]) -> bool:
+    # Row-group min/max statistics on the stay dates; keep the group when stats are missing
+    meta = pf.metadata.row_group(row_group)
+    names = [meta.column(i).path_in_schema for i in range(meta.num_columns)]
+    for field, bound, low_side in (("check_in_date", date_from, True), ("check_out_date", date_to, False)):
+        if not bound or field not in columns or columns[field] not in names:
+            continue
+        stats = meta.column(names.index(columns[field])).statistics
+        if stats is None or not stats.has_min_max:
+            continue
+        limit = pd.Timestamp(bound)
+        value = pd.to_datetime(str(stats.max if low_side else stats.min)[:10], errors="coerce")
+        if pd.isna(value):
+            continue
+        if (low_side and value < limit) or (not low_side and value > limit):
+            return False
+    return True
+
+
+def _iter_row_groups(pf, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    metrics = get_metrics()
+    columns = _column_map(pf.schema_arrow.names)
+    for i in range(pf.num_row_groups):
+        if not _row_group_in_range(pf, i, columns, date_from, date_to):
+            metrics.inc("parquet_row_groups_skipped_total")
+            continue
+        with metrics.span("index_stage", stage="parse"):
+            frame = _project(pf.read_row_group(i, columns=list(columns.values())))
+        yield frame
+
+
+def _starts_with_json_line(stream: io.BufferedReader) -> bool:
+    # A .json body is read as NDJSON only when its first line is a complete JSON object
+    # followed by a newline; a single-line document (e.g. pandas' column orient) is not
+    head = stream.peek(1).decode("utf-8-sig", errors="replace").lstrip()
+    first, newline, _ = head.partition("\n")
+    if not newline:
+        return False
+    try:
+        return isinstance(json.loads(first), dict)
+    except ValueError:
+        return False
+
+
+def _stream_frames(stream: io.BufferedReader, key: str, block_size: int) -> Iterator[pd.DataFrame]:
+    # Decodes a stream opened by the fetch worker, one batch at a time
+    if key.lower().endswith(".csv"):
+        yield from _iter_csv_batches(stream, block_size)
+    elif key.lower().endswith((".jsonl", ".ndjson")) or _starts_with_json_line(stream):
+        yield from _iter_ndjson_batches(stream, block_size)
+    else:
+        # A JSON array or pretty-printed document cannot be split into batches
+        with stream:
+            body = stream.read()
+        frame = normalize_columns(_parse_bytes_to_dataframe(body, key))
+        yield frame[REQUIRED_COLUMNS]
+
+
+class _ObjectFrames:
+    # The frames of one opened object. close() releases its streaming body (and so its
+    # pooled connection) even when iteration never started.
+    def __init__(self, frames: Iterable[pd.DataFrame], stream: Optional[io.BufferedReader] = None):
+        self._frames = frames
+        self._stream = stream
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return iter(self._frames)
+
+    def close(self) -> None:
+        close = getattr(self._frames, "close", None)
+        if close is not None:
+            close()
+        if self._stream is not None:
+            self._stream.close()
+
+
+def _open_object_frames(
+    s3_client,
+    bucket: str,
+    key: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> _ObjectFrames:
+    # Runs on a fetch worker. Frames hold only REQUIRED_COLUMNS and are decoded by the
+    # consumer one batch or row group at a time, so a whole body and a whole DataFrame
+    # are never held together. The GET is issued here, ahead of the consumer: Parquet
+    # footers are fetched, and CSV and JSON streams are opened with their first block read.
     settings = get_settings()
-    session = boto3.Session(profile_name=settings.aws.profile) if settings.aws.profile else boto3.Session()
-    s3 = session.client("s3", region_name=settings.aws.region)
+    stream: Optional[io.BufferedReader] = None
+    if key.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        with get_metrics().span("index_stage", stage="s3_download"):
+            source = _S3RangeFile(s3_client, bucket, key, settings.aws.s3_parquet_tail_bytes)
+            pf = pq.ParquetFile(source, pre_buffer=True)
+        get_metrics().inc("s3_objects_total")
+        frames: Iterable[pd.DataFrame] = _iter_row_groups(pf, date_from, date_to)
+    elif key.lower().endswith((".csv", ".json", ".jsonl", ".ndjson")):
+        block_size = max(64 * 1024, settings.aws.s3_stream_block_size)
+        stream = _open_stream(s3_client, bucket, key, block_size)
+        try:
+            with get_metrics().span("index_stage", stage="s3_download"):
+                stream.peek(1)
+        except BaseException:
+            stream.close()
+            raise
+        frames = _stream_frames(stream, key, block_size)
+    else:
+        raise ValueError(f"Unsupported file type for key: {key}")
+    if date_from or date_to:
+        frames = (filter_by_dates(frame, date_from, date_to) for frame in frames)
+    return _ObjectFrames(frames, stream)
+
+
+def _release_frames(future: Future) -> None:
+    # Done callback for objects opened ahead of a consumer that stopped early
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def iter_s3_objects(
+    keys: Sequence[str],
+    s3_client=None,
+    max_workers: Optional[int] = None,
+    prefetch: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Iterator[Tuple[str, Iterable[pd.DataFrame]]]:
+    # Opens objects on a bounded thread pool and yields them in key order. At most
+    # `prefetch` objects are opened ahead of the consumer, so fetching overlaps with
+    # downstream processing while memory stays bounded. With date_from/date_to, Parquet
+    # row groups outside the range are skipped and rows are filtered like the search filters.
+    settings = get_settings()
+    s3 = s3_client or get_s3_client()
+    workers = max(1, max_workers or settings.aws.s3_max_concurrency)
+    window = max(workers, prefetch or settings.aws.s3_prefetch)
+    pending: Deque[Tuple[str, Future]] = deque()
+    key_iter = iter(keys)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-fetch") as pool:
+        try:
+            for key in key_iter:
+                pending.append((key, pool.submit(_open_object_frames, s3, settings.aws.s3_bucket, key, date_from, date_to)))
+                if len(pending) >= window:
+                    break
+            while pending:
+                key, future = pending.popleft()
+                frames = future.result()
+                next_key = next(key_iter, None)
+                if next_key is not None:
+                    pending.append((next_key, pool.submit(_open_object_frames, s3, settings.aws.s3_bucket, next_key, date_from, date_to)))
+                yield key, frames
+        finally:
+            # Objects already opened (or still opening) hold streaming bodies; close them
+            # so their connections go back to the pool
+            for _, future in pending:
+                if not future.cancel():
+                    future.add_done_callback(_release_frames)
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    # Ensure required columns exist
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    return df
+
+
+def list_s3_objects(prefix: Optional[str] = None, s3_client=None) -> List[Dict[str, Any]]:
+    settings = get_settings()
+    s3 = s3_client or get_s3_client()
     paginator = s3.get_paginator("list_objects_v2")
-    keys: List[str] = []
+    objects: List[Dict[str, Any]] = []
     for page in paginator.paginate(Bucket=settings.aws.s3_bucket, Prefix=prefix or settings.aws.s3_prefix):
         for content in page.get("Contents", []):
             key = content["Key"]
-            if key.endswith((".csv", ".json", ".parquet")):
-                keys.append(key)
-    return keys
+            if key.endswith((".csv", ".json", ".jsonl", ".ndjson", ".parquet")):
+                last_modified = content.get("LastModified")
+                objects.append({
+                    "key": key,
+                    "etag": str(content.get("ETag", "")).strip('"'),
+                    "last_modified": last_modified.isoformat() if last_modified is not None else None,
+                    "size": int(content.get("Size", 0)),
+                })
+    return objects
 
 
-def load_invoices_from_s3(prefix: Optional[str] = None) -> pd.DataFrame:
-    settings = get_settings()
-    session = boto3.Session(profile_name=settings.aws.profile) if settings.aws.profile else boto3.Session()
-    s3 = session.client("s3", region_name=settings.aws.region)
-    keys = list_s3_keys(prefix)
+def list_s3_keys(prefix: Optional[str] = None, s3_client=None) -> List[str]:
+    return [o["key"] for o in list_s3_objects(prefix, s3_client=s3_client)]
+
+
+def load_invoices_from_s3(
+    prefix: Optional[str] = None,
+    s3_client=None,
+    max_workers: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    keys: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    s3 = s3_client or get_s3_client()
+    keys = list(keys) if keys is not None else list_s3_keys(prefix, s3_client=s3)
     frames: List[pd.DataFrame] = []
-    for key in keys:
-        df = _read_object_to_dataframe(s3, settings.aws.s3_bucket, key)
-        frames.append(df)
+    objects = iter_s3_objects(keys, s3_client=s3, max_workers=max_workers, date_from=date_from, date_to=date_to)
+    for _, object_frames in objects:
+        frames.extend(object_frames)
     if not frames:
         return pd.DataFrame()
     df_all = pd.concat(frames, ignore_index=True)
     # Normalize column names
-    df_all.columns = [c.strip().lower() for c in df_all.columns]
-    # Ensure required columns exist
-    for col in [
-        "invoice_id",
-        "guest_name",
-        "hotel_name",
-        "hotel_address",
-        "check_in_date",
-        "check_out_date",
-        "notes",
-    ]:
-        if col not in df_all.columns:
-            df_all[col] = None
-    return df_all
+    return normalize_columns(df_all)
+
+
+def iter_invoice_chunks(
+    prefix: Optional[str] = None,
+    chunk_size: int = 5000,
+    s3_client=None,
+    max_workers: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    keys: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    # Yields normalized frames of exactly chunk_size rows (the last one may be shorter).
+    # Besides the pending chunk buffer, only the prefetch window of objects is held.
+    s3 = s3_client or get_s3_client()
+    chunk_size = max(1, chunk_size)
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+    # An explicit key list (e.g. one index shard) replaces listing the prefix
+    keys = list(keys) if keys is not None else list_s3_keys(prefix, s3_client=s3)
+    objects = iter_s3_objects(keys, s3_client=s3, max_workers=max_workers, date_from=date_from, date_to=date_to)
+    for _, object_frames in objects:
+        for frame in object_frames:
+            frame = normalize_columns(frame)
+            start = 0
+            while start < len(frame):
+                take = min(chunk_size - pending_rows, len(frame) - start)
+                pending.append(frame.iloc[start:start + take])
+                pending_rows += take
+                start += take
+                if pending_rows == chunk_size:
+                    yield pd.concat(pending, ignore_index=True)
+                    pending, pending_rows = [], 0
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def invoice_columns(data) -> Dict[str, np.ndarray]:
+    # One object array per REQUIRED_COLUMNS field, read column-wise from a DataFrame or a
+    # pyarrow Table. Missing values (NaN, None, NaT, NA) become None; invoice_id is always a str.
+    n_rows = data.num_rows if hasattr(data, "column_names") else len(data)
+    names = {str(c).strip().lower(): c for c in (data.column_names if hasattr(data, "column_names") else data.columns)}
+    columns: Dict[str, np.ndarray] = {}
+    for col in REQUIRED_COLUMNS:
+        if col not in names:
+            values = np.full(n_rows, None, dtype=object)
+        elif hasattr(data, "column_names"):
+            values = np.array(data.column(names[col]).to_pylist(), dtype=object)
+        else:
+            series = data[names[col]]
+            values = series.to_numpy(dtype=object, copy=True)
+            values[series.isna().to_numpy()] = None
+        columns[col] = values
+    ids = columns["invoice_id"]
+    present = ids != None  # noqa: E711 - elementwise comparison
+    ids[present] = ids[present].astype(str)
+    ids[~present] = ""
+    return columns
 
 
 def iter_invoice_records(df: pd.DataFrame) -> Iterable[InvoiceRecord]:
-    for _, row in df.iterrows():
-        yield InvoiceRecord(
-            invoice_id=str(row.get("invoice_id", "")),
-            guest_name=row.get("guest_name"),
-            hotel_name=row.get("hotel_name"),
-            hotel_address=row.get("hotel_address"),
-            check_in_date=row.get("check_in_date"),
-            check_out_date=row.get("check_out_date"),
-            notes=row.get("notes"),
-        )
+    columns = invoice_columns(df)
+    for values in zip(*(columns[f] for f in InvoiceRecord.__slots__)):
+        yield InvoiceRecord(*values)
 
 
@@ -2,14 +2,18 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 
 from ai_finance.config import get_settings
 from ai_finance.embedding.encoder import EmbeddingEncoder
-from ai_finance.search.opensearch_client import search_bm25
-from ai_finance.storage.qdrant_client import search_similar
+from ai_finance.matching.cache import get_match_cache
+from ai_finance.matching.rerank import rerank_candidates
+from ai_finance.metrics import get_metrics
+from ai_finance.pipeline.generation import get_index_generation
+from ai_finance.search.opensearch_client import search_bm25, search_bm25_batch
+from ai_finance.storage.qdrant_client import retrieve_vectors, search_similar, search_similar_batch
 
 
 @dataclass
@@ -21,6 +25,15 @@ class MatchCandidate:
     payload: Dict
 
 
+@dataclass
+class MatchRequest:
+    query_text: str
+    source_doc: Dict
+    hotel_name: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+
 def _within_date_window(source: Dict, candidate: Dict, window_days: int) -> bool:
     def to_dt(v: Optional[str]) -> Optional[datetime]:
         if not v:
@@ -48,6 +61,66 @@ def compute_blended_score(bm25_score: float, vector_score: float, alpha: float)
     return alpha * vector_score + (1.0 - alpha) * bm25_score
 
 
+def _build_query_text(source_doc: Dict) -> str:
+    # Build query vector text from salient fields
+    text_fields = [
+        source_doc.get("guest_name", ""),
+        source_doc.get("hotel_name", ""),
+        source_doc.get("hotel_address", ""),
+        source_doc.get("notes", ""),
+    ]
+    return " ".join([t for t in text_fields if t])
+
+
+def _score_stored_candidates(
+    query_vec: np.ndarray,
+    bm25_hits: List[Tuple[str, float, Dict]],
+    stored: Dict[str, Tuple[np.ndarray, Dict]],
+) -> List[Tuple[str, float, Dict]]:
+    # Cosine similarity of the query against the stored vectors of exactly the BM25 candidates
+    ids = [h[0] for h in bm25_hits if h[0] in stored]
+    if not ids:
+        return []
+    matrix = np.stack([stored[i][0] for i in ids]).astype(np.float32, copy=False)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    scores = (matrix @ np.asarray(query_vec, dtype=np.float32)) / norms
+    return [(i, float(score), stored[i][1]) for i, score in zip(ids, scores)]
+
+
+def _blend_candidates(
+    source_doc: Dict,
+    bm25_hits: List[Tuple[str, float, Dict]],
+    vec_hits: List[Tuple[str, float, Dict]],
+    alpha: float,
+    window_days: int,
+    top_n: Optional[int] = None,
+) -> List[MatchCandidate]:
+    metrics = get_metrics()
+    metrics.inc("match_candidates_total", len(bm25_hits), stage="bm25")
+    metrics.inc("match_candidates_total", len(vec_hits), stage="vector")
+    ranked = rerank_candidates(
+        source_doc,
+        bm25_hits,
+        vec_hits,
+        alpha,
+        window_days,
+        blend=compute_blended_score,
+        top_n=top_n,
+    )
+    metrics.inc("match_results_total", len(ranked))
+    return [
+        MatchCandidate(
+            invoice_id=bm25_hits[i][0],
+            bm25_score=bm25_hits[i][1],
+            vector_score=vscore,
+            blended_score=blended,
+            payload=payload,
+        )
+        for i, vscore, blended, payload in ranked
+    ]
+
+
 def multistage_match(
     query_text: str,
     source_doc: Dict,
@@ -57,52 +130,144 @@ def multistage_match(
     encoder: Optional[EmbeddingEncoder] = None,
 ) -> List[MatchCandidate]:
     settings = get_settings()
+    metrics = get_metrics()
+    metrics.inc("match_requests_total")
+
+    # Opt-in result cache, valid until the next index run bumps the generation
+    cache = get_match_cache()
+    if cache is not None:
+        cache_key = cache.key(query_text, source_doc, hotel_name, date_from, date_to)
+        generation = get_index_generation()
+        cached = cache.get(cache_key, generation)
+        metrics.inc("match_cache_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
 
     # Stage 1: BM25 candidate retrieval
-    bm25_hits = search_bm25(
-        query=query_text,
-        top_k=settings.pipeline.top_k_bm25,
-        hotel_name=hotel_name,
-        date_from=date_from,
-        date_to=date_to,
-    )
+    with metrics.span("match_stage", stage="bm25"):
+        bm25_hits = search_bm25(
+            query=query_text,
+            top_k=settings.pipeline.top_k_bm25,
+            hotel_name=hotel_name,
+            date_from=date_from,
+            date_to=date_to,
+        )
 
     # Stage 2: Vector similarity on candidates (or full) using encoder
     enc = encoder or EmbeddingEncoder()
-    # Build query vector from salient fields
-    text_fields = [
-        source_doc.get("guest_name", ""),
-        source_doc.get("hotel_name", ""),
-        source_doc.get("hotel_address", ""),
-        source_doc.get("notes", ""),
-    ]
-    query_vec = enc.encode([" ".join([t for t in text_fields if t])])[0]
+    with metrics.span("match_stage", stage="encode"):
+        query_vec = enc.encode([_build_query_text(source_doc)])[0]
 
-    # Option A: Direct vector search in Qdrant with optional hotel_name filter
-    vec_hits = search_similar(query_vector=query_vec, top_k=settings.pipeline.top_k_vector, hotel_name=hotel_name)
-    vec_scores: Dict[str, Tuple[float, Dict]] = {vid: (score, payload) for vid, score, payload in vec_hits}
+    with metrics.span("match_stage", stage="vector"):
+        if settings.pipeline.vector_mode == "candidates":
+            # Option B: score exactly the BM25 candidates from their stored vectors
+            stored = retrieve_vectors([h[0] for h in bm25_hits])
+            vec_hits = _score_stored_candidates(query_vec, bm25_hits, stored)
+        else:
+            # Option A: Direct vector search in Qdrant with the hotel_name and date filters pushed down
+            vec_hits = search_similar(
+                query_vector=query_vec,
+                top_k=settings.pipeline.top_k_vector,
+                hotel_name=hotel_name,
+                date_from=date_from,
+                date_to=date_to,
+            )
 
     # Stage 3: Blend scores and apply rule-based checks
-    alpha = settings.pipeline.blend_alpha
-    window_days = settings.pipeline.date_window_days
-    candidates: List[MatchCandidate] = []
-    for inv_id, bm25_score, bm25_src in bm25_hits:
-        vscore, vpayload = vec_scores.get(inv_id, (0.0, {}))
-        payload = {**bm25_src, **vpayload}
-        if not _within_date_window(source_doc, payload, window_days):
-            continue
-        blended = compute_blended_score(bm25_score, vscore, alpha)
-        candidates.append(
-            MatchCandidate(
-                invoice_id=inv_id,
-                bm25_score=bm25_score,
-                vector_score=vscore,
-                blended_score=blended,
-                payload=payload,
-            )
+    with metrics.span("match_stage", stage="rerank"):
+        candidates = _blend_candidates(
+            source_doc,
+            bm25_hits,
+            vec_hits,
+            settings.pipeline.blend_alpha,
+            settings.pipeline.date_window_days,
+            top_n=settings.pipeline.top_n_results or None,
         )
-
-    candidates.sort(key=lambda c: c.blended_score, reverse=True)
+    if cache is not None:
+        cache.put(cache_key, generation, candidates)
     return candidates
 
 
+def multistage_match_batch(
+    requests: Sequence[MatchRequest],
+    encoder: Optional[EmbeddingEncoder] = None,
+    chunk_size: Optional[int] = None,
+) -> List[List[MatchCandidate]]:
+    # Same per-request results as multistage_match, but each chunk costs one _msearch,
+    # one encode call and one Qdrant batch search instead of three calls per request.
+    settings = get_settings()
+    metrics = get_metrics()
+    enc = encoder or EmbeddingEncoder()
+    size = max(1, chunk_size or settings.pipeline.match_batch_size)
+
+    # Cached requests are answered up front; only the misses go through the stages
+    cache = get_match_cache()
+    matched: List[Optional[List[MatchCandidate]]] = [None] * len(requests)
+    if cache is not None:
+        generation = get_index_generation()
+        cache_keys = [cache.key(r.query_text, r.source_doc, r.hotel_name, r.date_from, r.date_to) for r in requests]
+        matched = [cache.get(k, generation) for k in cache_keys]
+        hits = sum(1 for m in matched if m is not None)
+        metrics.inc("match_requests_total", hits)
+        metrics.inc("match_cache_total", hits, result="hit")
+        metrics.inc("match_cache_total", len(requests) - hits, result="miss")
+    todo = [i for i, m in enumerate(matched) if m is None]
+
+    results: List[List[MatchCandidate]] = []
+    for start in range(0, len(todo), size):
+        chunk = [requests[i] for i in todo[start:start + size]]
+        metrics.inc("match_requests_total", len(chunk))
+
+        # Stage 1: BM25 candidate retrieval
+        with metrics.span("match_batch_stage", stage="bm25"):
+            bm25_batch = search_bm25_batch(
+                [
+                    {
+                        "query": r.query_text,
+                        "hotel_name": r.hotel_name,
+                        "date_from": r.date_from,
+                        "date_to": r.date_to,
+                    }
+                    for r in chunk
+                ],
+                top_k=settings.pipeline.top_k_bm25,
+            )
+
+        # Stage 2: one forward pass and one batch search for the whole chunk
+        with metrics.span("match_batch_stage", stage="encode"):
+            query_vecs = enc.encode([_build_query_text(r.source_doc) for r in chunk])
+        with metrics.span("match_batch_stage", stage="vector"):
+            if settings.pipeline.vector_mode == "candidates":
+                stored = retrieve_vectors([h[0] for hits in bm25_batch for h in hits])
+                vec_batch = [
+                    _score_stored_candidates(query_vecs[j], bm25_batch[j], stored)
+                    for j in range(len(chunk))
+                ]
+            else:
+                vec_batch = search_similar_batch(
+                    query_vecs,
+                    top_k=settings.pipeline.top_k_vector,
+                    hotel_names=[r.hotel_name for r in chunk],
+                    dates_from=[r.date_from for r in chunk],
+                    dates_to=[r.date_to for r in chunk],
+                )
+
+        # Stage 3: Blend scores and apply rule-based checks
+        with metrics.span("match_batch_stage", stage="rerank"):
+            for r, bm25_hits, vec_hits in zip(chunk, bm25_batch, vec_batch):
+                results.append(
+                    _blend_candidates(
+                        r.source_doc,
+                        bm25_hits,
+                        vec_hits,
+                        settings.pipeline.blend_alpha,
+                        settings.pipeline.date_window_days,
+                        top_n=settings.pipeline.top_n_results or None,
+                    )
+                )
+
+    for i, candidates in zip(todo, results):
+        matched[i] = candidates
+        if cache is not None:
+            cache.put(cache_keys[i], generation, candidates)
+    return matched
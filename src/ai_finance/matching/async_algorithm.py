@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence
+
+from ai_finance.config import get_settings
+from ai_finance.embedding.encoder import EmbeddingEncoder
+from ai_finance.matching.algorithm import (
+    MatchCandidate,
+    MatchRequest,
+    _blend_candidates,
+    _build_query_text,
+    _score_stored_candidates,
+)
+from ai_finance.matching.cache import get_match_cache
+from ai_finance.metrics import get_metrics
+from ai_finance.pipeline.generation import get_index_generation
+from ai_finance.search.opensearch_client import search_bm25_async
+from ai_finance.storage.qdrant_client import retrieve_vectors_async, search_similar_async
+
+
+async def amultistage_match(
+    query_text: str,
+    source_doc: Dict,
+    hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    encoder: Optional[EmbeddingEncoder] = None,
+    executor: Optional[Executor] = None,
+) -> List[MatchCandidate]:
+    settings = get_settings()
+    metrics = get_metrics()
+    metrics.inc("match_requests_total")
+    enc = encoder or EmbeddingEncoder()
+    loop = asyncio.get_running_loop()
+
+    cache = get_match_cache()
+    if cache is not None:
+        cache_key = cache.key(query_text, source_doc, hotel_name, date_from, date_to)
+        # May read the generation from S3, so not on the event loop
+        generation = await loop.run_in_executor(None, get_index_generation)
+        cached = cache.get(cache_key, generation)
+        metrics.inc("match_cache_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+    async def encode_query():
+        # Encoding is CPU-bound, so it runs off the event loop
+        with metrics.span("match_stage", stage="encode"):
+            vectors = await loop.run_in_executor(executor, enc.encode, [_build_query_text(source_doc)])
+        return vectors[0]
+
+    async def bm25_stage():
+        with metrics.span("match_stage", stage="bm25"):
+            return await search_bm25_async(
+                query=query_text,
+                top_k=settings.pipeline.top_k_bm25,
+                hotel_name=hotel_name,
+                date_from=date_from,
+                date_to=date_to,
+            )
+
+    async def vector_stage():
+        query_vec = await encode_query()
+        with metrics.span("match_stage", stage="vector"):
+            return await search_similar_async(
+                query_vector=query_vec,
+                top_k=settings.pipeline.top_k_vector,
+                hotel_name=hotel_name,
+                date_from=date_from,
+                date_to=date_to,
+            )
+
+    if settings.pipeline.vector_mode == "candidates":
+        # Candidate scoring needs the BM25 ids, so only encoding overlaps with stage 1
+        bm25_hits, query_vec = await asyncio.gather(bm25_stage(), encode_query())
+        with metrics.span("match_stage", stage="vector"):
+            stored = await retrieve_vectors_async([h[0] for h in bm25_hits])
+            vec_hits = _score_stored_candidates(query_vec, bm25_hits, stored)
+    else:
+        # Stage 1 and stage 2 are independent, so they run concurrently
+        bm25_hits, vec_hits = await asyncio.gather(bm25_stage(), vector_stage())
+
+    # Stage 3: Blend scores and apply rule-based checks
+    with metrics.span("match_stage", stage="rerank"):
+        candidates = _blend_candidates(
+            source_doc,
+            bm25_hits,
+            vec_hits,
+            settings.pipeline.blend_alpha,
+            settings.pipeline.date_window_days,
+            top_n=settings.pipeline.top_n_results or None,
+        )
+    if cache is not None:
+        cache.put(cache_key, generation, candidates)
+    return candidates
+
+
+async def amultistage_match_many(
+    requests: Sequence[MatchRequest],
+    encoder: Optional[EmbeddingEncoder] = None,
+    concurrency: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> List[List[MatchCandidate]]:
+    settings = get_settings()
+    enc = encoder or EmbeddingEncoder()
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.pipeline.match_concurrency))
+
+    async def run(r: MatchRequest) -> List[MatchCandidate]:
+        async with semaphore:
+            return await amultistage_match(
+                r.query_text,
+                r.source_doc,
+                hotel_name=r.hotel_name,
+                date_from=r.date_from,
+                date_to=r.date_to,
+                encoder=enc,
+                executor=executor,
+            )
+
+    return list(await asyncio.gather(*(run(r) for r in requests)))
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ai_finance.config import get_settings
+from ai_finance.pooling import ProcessLocal
+
+# The source fields that feed the query vector and the date-window rerank
+MATCH_SOURCE_FIELDS = ("guest_name", "hotel_name", "hotel_address", "notes", "check_in_date", "check_out_date")
+
+
+def _normalize_query(text: Optional[str]) -> str:
+    # The BM25 analyzer lowercases and splits on whitespace anyway
+    return " ".join(str(text or "").lower().split())
+
+
+def _settings_fingerprint() -> Dict[str, Any]:
+    s = get_settings()
+    return {
+        "top_k_bm25": s.pipeline.top_k_bm25,
+        "top_k_vector": s.pipeline.top_k_vector,
+        "blend_alpha": s.pipeline.blend_alpha,
+        "date_window_days": s.pipeline.date_window_days,
+        "top_n_results": s.pipeline.top_n_results,
+        "vector_mode": s.pipeline.vector_mode,
+        "model_name": s.embed.model_name,
+        "embed_backend": s.embed.backend,
+        "index_name": s.opensearch.index_name,
+        "collection_name": s.qdrant.collection_name,
+    }
+
+
+class MatchCache:
+    # LRU of match results bounded by item count and age. Entries belong to one index
+    # generation; the first lookup at a newer generation empties the cache.
+    def __init__(self, max_items: int = 10_000, ttl_seconds: float = 3600.0):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation: Optional[str] = None
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(
+        self,
+        query_text: str,
+        source_doc: Dict,
+        hotel_name: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> str:
+        raw = json.dumps(
+            {
+                "query": _normalize_query(query_text),
+                "source": [source_doc.get(f) for f in MATCH_SOURCE_FIELDS],
+                "hotel_name": hotel_name,
+                "date_from": date_from,
+                "date_to": date_to,
+                "settings": _settings_fingerprint(),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _check_generation(self, generation: str) -> None:
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: str, generation: str) -> Optional[Any]:
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        # Callers get their own copy, so mutating a result can't change the cached one
+        return copy.deepcopy(value)
+
+    def put(self, key: str, generation: str, value: Any) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self._generation:
+                # Computed against an index that has been rebuilt since the lookup
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "items": len(self._entries),
+        }
+
+
+def _create_match_cache() -> MatchCache:
+    s = get_settings()
+    return MatchCache(max_items=s.pipeline.match_cache_max_items, ttl_seconds=s.pipeline.match_cache_ttl_seconds)
+
+
+_match_cache = ProcessLocal(_create_match_cache)
+
+
+def get_match_cache() -> Optional[MatchCache]:
+    # None unless MATCH_CACHE_ENABLED; the cache is opt-in
+    if not get_settings().pipeline.match_cache_enabled:
+        return None
+    return _match_cache.get()
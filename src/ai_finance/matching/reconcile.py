@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ai_finance.config import get_settings
+from ai_finance.embedding.encoder import EmbeddingEncoder
+from ai_finance.matching.algorithm import compute_blended_score
+from ai_finance.matching.rerank import to_day_array
+from ai_finance.pipeline.index_pipeline import build_documents, build_texts_for_embedding
+from ai_finance.search.local_bm25 import FIELD_BOOSTS, analyze
+
+HOTEL_STOPWORDS = {"the", "hotel", "hotels", "and", "spa", "resort", "suites"}
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for c in letters}
+
+BlockKey = Tuple[str, str, Optional[int]]
+
+# Below this many candidate pairs, process start-up costs more than scoring inline
+POOL_MIN_PAIRS = 2_000_000
+
+
+def normalize_hotel(name) -> str:
+    # "The Grand Hôtel & Spa" and "GrandHotel" both map to "grand"
+    tokens = [t for t in analyze(name) if t not in HOTEL_STOPWORDS]
+    joined = "".join(tokens)
+    return joined.replace("hotel", "") or joined
+
+
+def soundex(word: str) -> str:
+    word = "".join(c for c in word.lower() if c.isalpha())
+    if not word:
+        return ""
+    codes = [_SOUNDEX_CODES.get(c, "") for c in word]
+    out = word[0]
+    last = codes[0]
+    for c, code in zip(word[1:], codes[1:]):
+        if code and code != "0" and code != last:
+            out += code
+        if c not in "hw":
+            last = code
+    return (out + "000")[:4]
+
+
+def guest_block_key(name, mode: str = "soundex") -> str:
+    tokens = analyze(name)
+    if not tokens or mode == "none":
+        return ""
+    surname = tokens[-1]
+    if mode == "prefix":
+        return surname[:2]
+    return soundex(surname)
+
+
+def _week(days: np.ndarray) -> np.ndarray:
+    # Weeks since the epoch; NaT -> -1
+    out = np.full(len(days), -1, dtype=np.int64)
+    valid = ~np.isnat(days)
+    out[valid] = days[valid].astype(np.int64) // 7
+    return out
+
+
+class _ReconcileState:
+    # Precomputed per-side features shared with worker processes
+    def __init__(
+        self,
+        invoice_tokens: List[set],
+        booking_weights: Dict[str, List[Dict[str, float]]],
+        invoice_vectors: np.ndarray,
+        booking_vectors: np.ndarray,
+        invoice_days: Tuple[np.ndarray, np.ndarray],
+        booking_days: Tuple[np.ndarray, np.ndarray],
+        alpha: float,
+        window_days: int,
+        top_n: int,
+    ):
+        self.invoice_tokens = invoice_tokens
+        self.booking_weights = booking_weights
+        self.invoice_vectors = invoice_vectors
+        self.booking_vectors = booking_vectors
+        self.invoice_days = invoice_days
+        self.booking_days = booking_days
+        self.alpha = alpha
+        self.window_days = window_days
+        self.top_n = top_n
+
+
+_STATE: Optional[_ReconcileState] = None
+
+
+def _init_worker(state: _ReconcileState) -> None:
+    global _STATE
+    _STATE = state
+
+
+def _booking_field_weights(documents: List[Dict], k1: float = 1.2, b: float = 0.75) -> Dict[str, List[Dict[str, float]]]:
+    # Per field, each booking's BM25 term weights: idf * tf / (tf + k1 * (1 - b + b * dl / avgdl))
+    weights: Dict[str, List[Dict[str, float]]] = {}
+    for field in FIELD_BOOSTS:
+        counts = [Counter(analyze(d.get(field))) for d in documents]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float64)
+        has_field = lengths > 0
+        n_docs = int(has_field.sum())
+        avg = float(lengths[has_field].mean()) if n_docs else 1.0
+        df = Counter(t for c in counts for t in c)
+        idf = {t: float(np.log(1.0 + (n_docs - n + 0.5) / (n + 0.5))) for t, n in df.items()}
+        field_weights: List[Dict[str, float]] = []
+        for c, dl in zip(counts, lengths):
+            norm = k1 * (1.0 - b + b * dl / avg)
+            field_weights.append({t: idf[t] * tf / (tf + norm) for t, tf in c.items()})
+        weights[field] = field_weights
+    return weights
+
+
+def _pair_date_mask(inv_days: np.ndarray, book_days: np.ndarray, window_days: int) -> np.ndarray:
+    # Same rule as _within_date_window: only enforced when both sides have a date
+    diff = np.abs((inv_days[:, None] - book_days[None, :]).astype("timedelta64[D]").astype(np.float64))
+    missing = np.isnat(inv_days)[:, None] | np.isnat(book_days)[None, :]
+    return missing | (diff <= window_days)
+
+
+def _score_block(block: Tuple[np.ndarray, np.ndarray]) -> List[Tuple[int, int, float, float, float]]:
+    state = _STATE
+    inv_idx, book_idx = block
+    if state is None or not len(inv_idx) or not len(book_idx):
+        return []
+
+    # Lexical: best boosted field score, as in the best_fields multi_match
+    vocab: Dict[str, int] = {}
+    for field in FIELD_BOOSTS:
+        for j in book_idx:
+            for t in state.booking_weights[field][j]:
+                vocab.setdefault(t, len(vocab))
+    queries = np.zeros((len(inv_idx), max(len(vocab), 1)), dtype=np.float32)
+    for r, i in enumerate(inv_idx):
+        cols = [vocab[t] for t in state.invoice_tokens[i] if t in vocab]
+        queries[r, cols] = 1.0
+    lexical = np.zeros((len(inv_idx), len(book_idx)), dtype=np.float32)
+    for field, boost in FIELD_BOOSTS.items():
+        docs = np.zeros((len(book_idx), queries.shape[1]), dtype=np.float32)
+        for r, j in enumerate(book_idx):
+            for t, w in state.booking_weights[field][j].items():
+                docs[r, vocab[t]] = w
+        np.maximum(lexical, boost * (queries @ docs.T), out=lexical)
+
+    cosine = state.invoice_vectors[inv_idx] @ state.booking_vectors[book_idx].T
+    mask = _pair_date_mask(state.invoice_days[0][inv_idx], state.booking_days[0][book_idx], state.window_days)
+    mask &= _pair_date_mask(state.invoice_days[1][inv_idx], state.booking_days[1][book_idx], state.window_days)
+    blended = compute_blended_score(lexical.astype(np.float64), cosine.astype(np.float64), state.alpha)
+    blended[~mask] = -np.inf
+
+    out: List[Tuple[int, int, float, float, float]] = []
+    k = min(state.top_n, len(book_idx))
+    best = np.argpartition(-blended, k - 1, axis=1)[:, :k] if k < len(book_idx) else np.tile(np.arange(len(book_idx)), (len(inv_idx), 1))
+    for r in range(len(inv_idx)):
+        for c in best[r]:
+            if np.isfinite(blended[r, c]):
+                out.append((int(inv_idx[r]), int(book_idx[c]), float(lexical[r, c]), float(cosine[r, c]), float(blended[r, c])))
+    return out
+
+
+def build_blocks(
+    invoices: List[Dict],
+    bookings: List[Dict],
+    window_days: int,
+    guest_key: str = "soundex",
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    # Bookings sit in exactly one (hotel, guest, check-in week) block. Each invoice joins
+    # every week block its date window can reach, so a pair is scored at most once.
+    booking_blocks: Dict[BlockKey, List[int]] = defaultdict(list)
+    booking_days = to_day_array([d.get("check_in_date") for d in bookings])
+    for j, (doc, week) in enumerate(zip(bookings, _week(booking_days))):
+        key = (normalize_hotel(doc.get("hotel_name")), guest_block_key(doc.get("guest_name"), guest_key), int(week))
+        booking_blocks[key].append(j)
+    weeks_by_group: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for hotel, guest, week in booking_blocks:
+        weeks_by_group[(hotel, guest)].append(week)
+
+    invoice_blocks: Dict[BlockKey, List[int]] = defaultdict(list)
+    invoice_days = to_day_array([d.get("check_in_date") for d in invoices])
+    for i, doc in enumerate(invoices):
+        group = (normalize_hotel(doc.get("hotel_name")), guest_block_key(doc.get("guest_name"), guest_key))
+        day = invoice_days[i]
+        if np.isnat(day):
+            # Undated invoices cannot be ruled out by date
+            weeks = weeks_by_group.get(group, [])
+        else:
+            first = int((day - np.timedelta64(window_days, "D")).astype(np.int64) // 7)
+            last = int((day + np.timedelta64(window_days, "D")).astype(np.int64) // 7)
+            weeks = list(range(first, last + 1)) + [-1]
+        for week in weeks:
+            if (group[0], group[1], week) in booking_blocks:
+                invoice_blocks[(group[0], group[1], week)].append(i)
+
+    return [
+        (np.asarray(inv, dtype=np.int64), np.asarray(booking_blocks[key], dtype=np.int64))
+        for key, inv in invoice_blocks.items()
+    ]
+
+
+def reconcile(
+    invoices: pd.DataFrame,
+    bookings: pd.DataFrame,
+    encoder: Optional[EmbeddingEncoder] = None,
+    top_n: int = 1,
+    guest_key: Optional[str] = None,
+    workers: Optional[int] = None,
+) -> pd.DataFrame:
+    # All-pairs invoice-to-booking matching restricted to blocking-key candidates. Returns
+    # up to top_n bookings per invoice with the same bm25/vector/blended score columns
+    # as MatchCandidate. Both frames use the invoice schema (REQUIRED_COLUMNS); bookings
+    # are identified by their booking_id column, or by invoice_id when there is none.
+    settings = get_settings()
+    window_days = settings.pipeline.date_window_days
+    inv_docs = build_documents(invoices)
+    book_docs = build_documents(bookings)
+    columns = ["invoice_id", "booking_id", "bm25_score", "vector_score", "blended_score", "rank"]
+    if not inv_docs or not book_docs:
+        return pd.DataFrame(columns=columns)
+
+    names = {str(c).strip().lower(): c for c in bookings.columns}
+    if "booking_id" in names:
+        booking_ids = bookings[names["booking_id"]].astype(str).tolist()
+    else:
+        booking_ids = [d["invoice_id"] for d in book_docs]
+
+    enc = encoder or EmbeddingEncoder()
+    inv_texts = build_texts_for_embedding(inv_docs)
+    state = _ReconcileState(
+        invoice_tokens=[set(analyze(t)) for t in inv_texts],
+        booking_weights=_booking_field_weights(book_docs),
+        invoice_vectors=np.asarray(enc.encode(inv_texts), dtype=np.float32),
+        booking_vectors=np.asarray(enc.encode(build_texts_for_embedding(book_docs)), dtype=np.float32),
+        invoice_days=(
+            to_day_array([d.get("check_in_date") for d in inv_docs]),
+            to_day_array([d.get("check_out_date") for d in inv_docs]),
+        ),
+        booking_days=(
+            to_day_array([d.get("check_in_date") for d in book_docs]),
+            to_day_array([d.get("check_out_date") for d in book_docs]),
+        ),
+        alpha=settings.pipeline.blend_alpha,
+        window_days=window_days,
+        top_n=max(1, top_n),
+    )
+    blocks = build_blocks(inv_docs, book_docs, window_days, guest_key=guest_key or settings.pipeline.reconcile_guest_key)
+
+    n_workers = workers or settings.pipeline.reconcile_workers or os.cpu_count() or 1
+    rows: List[Tuple[int, int, float, float, float]] = []
+    n_pairs = sum(len(inv) * len(book) for inv, book in blocks)
+    if n_workers <= 1 or len(blocks) < 2 or n_pairs < POOL_MIN_PAIRS:
+        _init_worker(state)
+        for block in blocks:
+            rows.extend(_score_block(block))
+    else:
+        # With fork the state is inherited instead of pickled
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+        ctx = multiprocessing.get_context(method)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx, initializer=_init_worker, initargs=(state,)) as pool:
+            for block_rows in pool.map(_score_block, blocks, chunksize=max(1, len(blocks) // (n_workers * 4))):
+                rows.extend(block_rows)
+
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    arr = np.array(rows, dtype=np.float64)
+    inv_idx = arr[:, 0].astype(np.int64)
+    book_idx = arr[:, 1].astype(np.int64)
+    # Best first per invoice, then keep top_n across all blocks the invoice joined
+    order = np.lexsort((book_idx, -arr[:, 4], inv_idx))
+    result = pd.DataFrame({
+        "invoice_id": [inv_docs[i]["invoice_id"] for i in inv_idx[order]],
+        "booking_id": [booking_ids[j] for j in book_idx[order]],
+        "bm25_score": arr[order, 2],
+        "vector_score": arr[order, 3],
+        "blended_score": arr[order, 4],
+    })
+    result = result.drop_duplicates(["invoice_id", "booking_id"])
+    result["rank"] = result.groupby("invoice_id", sort=False).cumcount() + 1
+    return result[result["rank"] <= state.top_n].reset_index(drop=True)
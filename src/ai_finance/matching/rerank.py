@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_finance.metrics import get_metrics
+
+_NAT = np.datetime64("NaT", "D")
+_EMPTY: Dict = {}
+
+
+def to_day_array(values: Sequence) -> np.ndarray:
+    # ISO dates (optionally with a time part) -> datetime64[D]; missing or invalid -> NaT
+    strings = [str(v).split("T")[0] if v else "" for v in values]
+    try:
+        return np.array(strings, dtype="datetime64[D]")
+    except ValueError:
+        out = np.empty(len(strings), dtype="datetime64[D]")
+        for i, s in enumerate(strings):
+            try:
+                out[i] = np.datetime64(datetime.fromisoformat(s).date(), "D") if s else _NAT
+            except ValueError:
+                out[i] = _NAT
+        return out
+
+
+def to_timestamp_array(values: Sequence) -> np.ndarray:
+    # ISO dates -> UTC epoch seconds at midnight as float64; missing or invalid -> NaN
+    days = to_day_array(values)
+    out = days.astype(np.int64).astype(np.float64) * 86400.0
+    out[np.isnat(days)] = np.nan
+    return out
+
+
+def to_timestamp_bound(value: str) -> float:
+    # A date filter bound -> UTC epoch seconds. Unlike the array form this raises: a NaN
+    # bound would silently match nothing (or be rejected by Qdrant without saying why).
+    ts = to_timestamp_array([value])[0]
+    if np.isnan(ts):
+        raise ValueError(f"Invalid date filter value: {value!r}")
+    return float(ts)
+
+
+def date_window_mask(source_day: np.datetime64, candidate_days: np.ndarray, window_days: int) -> np.ndarray:
+    # A rule only applies when both sides have a date, as in _within_date_window
+    if np.isnat(source_day):
+        return np.ones(len(candidate_days), dtype=bool)
+    diff = np.abs((candidate_days - source_day).astype("timedelta64[D]").astype(np.float64))
+    return np.isnat(candidate_days) | (diff <= window_days)
+
+
+def top_n_indices(scores: np.ndarray, top_n: Optional[int]) -> np.ndarray:
+    # Highest scores first; ties keep input order (like a stable descending sort)
+    idx = np.arange(len(scores))
+    if top_n is not None and 0 < top_n < len(scores):
+        idx = np.argpartition(-scores, top_n - 1)[:top_n]
+    order = np.lexsort((idx, -scores[idx]))
+    return idx[order]
+
+
+def rerank_candidates(
+    source_doc: Dict,
+    bm25_hits: List[Tuple[str, float, Dict]],
+    vec_hits: List[Tuple[str, float, Dict]],
+    alpha: float,
+    window_days: int,
+    blend: Callable,
+    top_n: Optional[int] = None,
+) -> List[Tuple[int, float, float, Dict]]:
+    # Returns (bm25 hit index, vector score, blended score, merged payload) for the
+    # surviving candidates, best first. `blend` must accept NumPy arrays.
+    n = len(bm25_hits)
+    if n == 0:
+        return []
+    vec_map: Dict[str, Tuple[float, Dict]] = {vid: (score, payload) for vid, score, payload in vec_hits}
+
+    bm25 = np.empty(n, dtype=np.float64)
+    vscores = np.zeros(n, dtype=np.float64)
+    vpayloads: List[Dict] = [_EMPTY] * n
+    c_in: List = [None] * n
+    c_out: List = [None] * n
+    for i, (inv_id, bm25_score, bm25_src) in enumerate(bm25_hits):
+        bm25[i] = bm25_score
+        hit = vec_map.get(inv_id)
+        vpayload = _EMPTY
+        if hit is not None:
+            vscores[i] = hit[0]
+            vpayload = vpayloads[i] = hit[1]
+        # Vector payload fields take precedence, matching {**bm25_src, **vpayload}
+        c_in[i] = vpayload["check_in_date"] if "check_in_date" in vpayload else bm25_src.get("check_in_date")
+        c_out[i] = vpayload["check_out_date"] if "check_out_date" in vpayload else bm25_src.get("check_out_date")
+
+    source_days = to_day_array([source_doc.get("check_in_date"), source_doc.get("check_out_date")])
+    mask = date_window_mask(source_days[0], to_day_array(c_in), window_days)
+    mask &= date_window_mask(source_days[1], to_day_array(c_out), window_days)
+    blended = blend(bm25, vscores, alpha)
+
+    kept = np.flatnonzero(mask)
+    get_metrics().inc("match_filtered_total", n - len(kept), rule="date_window")
+    selected = kept[top_n_indices(blended[kept], top_n)]
+
+    # Payload dicts are only materialized for the returned candidates
+    return [
+        (i, float(vscores[i]), float(blended[i]), {**bm25_hits[i][2], **vpayloads[i]})
+        for i in selected.tolist()
+    ]
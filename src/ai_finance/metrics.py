@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ai_finance.config import get_settings
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+PREFIX = "ai_finance_"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+    return "{" + inner + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    enabled = True
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(self.buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        # Records the wall time of the block into the "<name>_seconds" histogram
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        with self._lock:
+            out: List[Dict[str, object]] = []
+            for (name, labels), value in sorted(self._counters.items()):
+                out.append({"type": "counter", "name": name, "labels": dict(labels), "value": value})
+            for (name, labels), hist in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                out.append({
+                    "type": "histogram",
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": hist.count,
+                    "sum": hist.sum,
+                    "buckets": dict(zip([str(b) for b in hist.buckets] + ["+Inf"], hist.counts)),
+                })
+            return out
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            seen: set = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = PREFIX + name
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+            for (name, labels), hist in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                metric = PREFIX + name
+                if metric not in seen:
+                    lines.append(f"# TYPE {metric} histogram")
+                    seen.add(metric)
+                cumulative = 0
+                for bound, count in zip(list(hist.buckets) + [float("inf")], hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {hist.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        # Atomic replace, suitable for the node_exporter textfile collector
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def write_jsonl(self, path: str) -> None:
+        timestamp = time.time()
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.snapshot():
+                record["timestamp"] = timestamp
+                f.write(json.dumps(record))
+                f.write("\n")
+
+
+class _NullSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NoopMetrics:
+    # Used when metrics are disabled; every call is a constant-time no-op
+    enabled = False
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        pass
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        pass
+
+    def span(self, name: str, **labels) -> _NullSpan:
+        return _NULL_SPAN
+
+    def reset(self) -> None:
+        pass
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        return []
+
+    def to_prometheus(self) -> str:
+        return ""
+
+    def write_prometheus(self, path: str) -> None:
+        pass
+
+    def write_jsonl(self, path: str) -> None:
+        pass
+
+
+_registry: Optional[object] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry() if get_settings().metrics.enabled else NoopMetrics()
+    return _registry
+
+
+def set_metrics_enabled(enabled: bool) -> None:
+    global _registry
+    with _registry_lock:
+        _registry = MetricsRegistry() if enabled else NoopMetrics()
+
+
+def export_metrics() -> None:
+    # Writes the configured Prometheus textfile and/or JSON-lines snapshot, if any
+    settings = get_settings()
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return
+    if settings.metrics.prometheus_path:
+        metrics.write_prometheus(settings.metrics.prometheus_path)
+    if settings.metrics.jsonl_path:
+        metrics.write_jsonl(settings.metrics.jsonl_path)
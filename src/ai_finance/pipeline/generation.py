@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from ai_finance.config import get_settings
+
+# Index generation: an opaque token that every index run replaces once its writes are
+# done. Anything derived from the indexes (e.g. cached match results) records the
+# generation it was computed at and is dropped when the token changes. Each bump writes
+# a fresh random token rather than incrementing, so concurrent shards of one run can't
+# both write the same value. The token lives in a small JSON file, locally or on S3 like
+# the manifest, so index runs in other processes or on other Airflow workers invalidate
+# matchers too.
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"path": None, "stamp": None, "generation": "", "checked": 0.0}
+
+
+def _s3_location(path: str, s3_client=None):
+    # The matchers import this module, so boto3 and the ingestion stack load only when
+    # the token actually lives on S3
+    from ai_finance.ingestion.s3_ingest import get_s3_client
+
+    bucket, _, key = path[len("s3://"):].partition("/")
+    return s3_client or get_s3_client(), bucket, key
+
+
+def _read(path: str, s3_client=None) -> str:
+    # "" until the first index run
+    if path.startswith("s3://"):
+        s3, bucket, key = _s3_location(path, s3_client)
+        try:
+            body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+        except s3.exceptions.NoSuchKey:
+            return ""
+        return str(json.loads(body).get("generation", ""))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return str(json.load(f).get("generation", ""))
+    except FileNotFoundError:
+        return ""
+
+
+def _write(path: str, generation: str, s3_client=None) -> None:
+    body = json.dumps({"generation": generation, "updated_at": time.time()})
+    if path.startswith("s3://"):
+        s3, bucket, key = _s3_location(path, s3_client)
+        s3.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"))
+        return
+    # Write-then-rename, so readers never see a partial file
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+
+def _local_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def get_index_generation(s3_client=None) -> str:
+    # Local files are re-read only when they change (one stat per call); on S3 the
+    # token is polled at most every index_generation_poll_seconds.
+    settings = get_settings()
+    path = settings.pipeline.index_generation_path
+    now = time.monotonic()
+    with _lock:
+        same_path = _state["path"] == path
+        if path.startswith("s3://"):
+            if same_path and now - _state["checked"] < settings.pipeline.index_generation_poll_seconds:
+                return _state["generation"]
+            stamp = None
+        else:
+            stamp = _local_stamp(path)
+            if same_path and stamp == _state["stamp"]:
+                return _state["generation"]
+        generation = _read(path, s3_client=s3_client) if stamp is not None or path.startswith("s3://") else ""
+        _state.update(path=path, stamp=stamp, generation=generation, checked=now)
+        return generation
+
+
+def bump_index_generation(s3_client=None) -> str:
+    settings = get_settings()
+    path = settings.pipeline.index_generation_path
+    generation = uuid.uuid4().hex
+    with _lock:
+        _write(path, generation, s3_client=s3_client)
+        stamp = None if path.startswith("s3://") else _local_stamp(path)
+        _state.update(path=path, stamp=stamp, generation=generation, checked=time.monotonic())
+    return generation
@@ -1,64 +1,295 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import logging
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
+import pandas as pd
 
 from ai_finance.config import get_settings
 from ai_finance.embedding.encoder import EmbeddingEncoder
-from ai_finance.ingestion.s3_ingest import load_invoices_from_s3
-from ai_finance.search.opensearch_client import ensure_index, index_documents
-from ai_finance.storage.qdrant_client import ensure_collection, upsert_vectors
+from ai_finance.ingestion.s3_ingest import (
+    invoice_columns,
+    iter_invoice_chunks,
+    iter_s3_objects,
+    list_s3_objects,
+    load_invoices_from_s3,
+)
+from ai_finance.metrics import export_metrics, get_metrics
+from ai_finance.pipeline.generation import bump_index_generation
+from ai_finance.pipeline.manifest import IndexManifest, document_hash
+from ai_finance.pipeline.sharding import shard_keys
+from ai_finance.search.opensearch_client import (
+    count_documents,
+    delete_documents,
+    ensure_index,
+    fast_load_documents,
+    flush_documents,
+    index_documents,
+    refresh_documents,
+)
+from ai_finance.storage.qdrant_client import count_vectors, delete_vectors, ensure_collection, flush_vectors, upsert_vectors
+
+logger = logging.getLogger(__name__)
+
+
+DOCUMENT_FIELDS = (
+    "invoice_id",
+    "guest_name",
+    "hotel_name",
+    "hotel_address",
+    "notes",
+    "check_in_date",
+    "check_out_date",
+)
+EMBEDDING_FIELDS = ("guest_name", "hotel_name", "hotel_address", "notes")
+
+
+def documents_from_columns(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    # Bulk-index payloads zipped straight from the column arrays; no per-row Series
+    return [dict(zip(DOCUMENT_FIELDS, values)) for values in zip(*(columns[f] for f in DOCUMENT_FIELDS))]
+
+
+def texts_from_columns(columns: Dict[str, np.ndarray]) -> List[str]:
+    # Non-empty embedding fields joined by single spaces, built with vectorized string ops
+    text: Optional[pd.Series] = None
+    for field in EMBEDDING_FIELDS:
+        part = pd.Series(columns[field], dtype=object).fillna("").astype(str)
+        if text is None:
+            text = part
+            continue
+        sep = np.where((text != "").to_numpy() & (part != "").to_numpy(), " ", "")
+        text = text + sep + part
+    return [] if text is None else text.tolist()
 
 
 def build_documents(df) -> List[Dict]:
-    docs: List[Dict] = []
-    for _, row in df.iterrows():
-        doc = {
-            "invoice_id": str(row.get("invoice_id", "")),
-            "guest_name": row.get("guest_name"),
-            "hotel_name": row.get("hotel_name"),
-            "hotel_address": row.get("hotel_address"),
-            "notes": row.get("notes"),
-            "check_in_date": row.get("check_in_date"),
-            "check_out_date": row.get("check_out_date"),
-        }
-        docs.append(doc)
-    return docs
+    return documents_from_columns(invoice_columns(df))
 
 
 def build_texts_for_embedding(documents: List[Dict]) -> List[str]:
-    texts: List[str] = []
-    for d in documents:
-        parts = [
-            d.get("guest_name") or "",
-            d.get("hotel_name") or "",
-            d.get("hotel_address") or "",
-            d.get("notes") or "",
-        ]
-        texts.append(" ".join([p for p in parts if p]))
-    return texts
-
-
-def run_index_pipeline(s3_prefix: str | None = None) -> int:
+    columns = {f: np.array([d.get(f) for d in documents], dtype=object) for f in EMBEDDING_FIELDS}
+    return texts_from_columns(columns)
+
+
+def build_batch(df) -> Tuple[List[Dict], List[str]]:
+    # Documents and their embedding texts from one columnar pass over the frame
+    columns = invoice_columns(df)
+    return documents_from_columns(columns), texts_from_columns(columns)
+
+
+def _build_batch_timed(df) -> Tuple[List[Dict], List[str]]:
+    with get_metrics().span("index_stage", stage="build_documents"):
+        return build_batch(df)
+
+
+def _index_batch(documents: List[Dict], texts: List[str], encoder: EmbeddingEncoder) -> None:
+    metrics = get_metrics()
+    # OpenSearch
+    with metrics.span("index_stage", stage="bulk"):
+        index_documents(documents)
+
+    # Qdrant
+    with metrics.span("index_stage", stage="encode"):
+        vectors = encoder.encode(texts)
+    ids = [d["invoice_id"] for d in documents]
+    with metrics.span("index_stage", stage="upsert"):
+        upsert_vectors(ids=ids, vectors=vectors, payloads=documents)
+    metrics.inc("documents_indexed_total", len(documents))
+
+
+def _finish_encoding(encoder: EmbeddingEncoder) -> None:
+    stats = encoder.throughput()
+    logger.info(
+        "Encoded %d texts in %.2fs (%.1f texts/s, backend=%s, workers=%d, batch_size=%d)",
+        stats["texts"],
+        stats["seconds"],
+        stats["texts_per_s"],
+        encoder.backend,
+        encoder.workers,
+        encoder.batch_size,
+    )
+    encoder.close()
+
+
+def _run_streaming(
+    s3_prefix: Optional[str],
+    chunk_size: int,
+    date_from: Optional[str],
+    date_to: Optional[str],
+    keys: Optional[Sequence[str]] = None,
+) -> int:
+    ensure_index()
+    encoder = EmbeddingEncoder()
+    ensure_collection(encoder.dimension)
+    total = 0
+    started = time.perf_counter()
+    for chunk_no, df in enumerate(iter_invoice_chunks(prefix=s3_prefix, chunk_size=chunk_size, date_from=date_from, date_to=date_to, keys=keys), start=1):
+        chunk_started = time.perf_counter()
+        documents, texts = _build_batch_timed(df)
+        del df
+        _index_batch(documents, texts, encoder)
+        total += len(documents)
+        logger.info(
+            "Indexed chunk %d: %d documents in %.2fs (%d total, %.1f docs/s)",
+            chunk_no,
+            len(documents),
+            time.perf_counter() - chunk_started,
+            total,
+            total / max(time.perf_counter() - started, 1e-9),
+        )
+    _finish_encoding(encoder)
+    flush_documents()
+    flush_vectors()
+    return total
+
+
+def _run_incremental(s3_prefix: Optional[str], chunk_size: int, date_from: Optional[str], date_to: Optional[str]) -> int:
+    # Skips S3 objects whose ETag/LastModified match the manifest, skips documents whose
+    # content hash is unchanged, and deletes documents that disappeared from the source.
     settings = get_settings()
-    df = load_invoices_from_s3(prefix=s3_prefix)
+    manifest_path = settings.pipeline.manifest_path
+    manifest = IndexManifest.load(manifest_path)
+    previous_hashes = manifest.document_hashes()
+
+    listed = list_s3_objects(prefix=s3_prefix)
+    listed_keys = {o["key"] for o in listed}
+    changed = {o["key"]: o for o in listed if not manifest.is_unchanged(o)}
+    updated = IndexManifest({k: v for k, v in manifest.objects.items() if k in listed_keys and k not in changed})
+
+    ensure_index()
+    encoder = EmbeddingEncoder()
+    ensure_collection(encoder.dimension)
+
+    pending: List[Dict] = []
+    pending_texts: List[str] = []
+    indexed = 0
+    unchanged = 0
+    for key, frames in iter_s3_objects(list(changed), date_from=date_from, date_to=date_to):
+        doc_hashes: Dict[str, str] = {}
+        for frame in frames:
+            documents, texts = _build_batch_timed(frame)
+            for doc, text in zip(documents, texts):
+                doc_hash = document_hash(doc)
+                doc_hashes[doc["invoice_id"]] = doc_hash
+                if previous_hashes.get(doc["invoice_id"]) != doc_hash:
+                    pending.append(doc)
+                    pending_texts.append(text)
+                else:
+                    unchanged += 1
+            if len(pending) >= chunk_size:
+                _index_batch(pending, pending_texts, encoder)
+                indexed += len(pending)
+                pending, pending_texts = [], []
+        entry = {k: v for k, v in changed[key].items() if k != "key"}
+        entry["docs"] = doc_hashes
+        updated.objects[key] = entry
+    if pending:
+        _index_batch(pending, pending_texts, encoder)
+        indexed += len(pending)
+
+    metrics = get_metrics()
+    metrics.inc("objects_unchanged_total", len(listed) - len(changed))
+    metrics.inc("documents_unchanged_total", unchanged)
+    removed = sorted(set(previous_hashes) - set(updated.document_hashes()))
+    metrics.inc("documents_deleted_total", len(removed))
+    for start in range(0, len(removed), chunk_size):
+        batch = removed[start:start + chunk_size]
+        delete_documents(batch)
+        delete_vectors(batch)
+
+    _finish_encoding(encoder)
+    flush_documents()
+    flush_vectors()
+    updated.save(manifest_path)
+    logger.info(
+        "Incremental index: %d/%d objects changed, %d documents indexed, %d deleted",
+        len(changed),
+        len(listed),
+        indexed,
+        len(removed),
+    )
+    return indexed
+
+
+def _run_full(
+    s3_prefix: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    keys: Optional[Sequence[str]] = None,
+) -> int:
+    df = load_invoices_from_s3(prefix=s3_prefix, date_from=date_from, date_to=date_to, keys=keys)
     if df.empty:
         return 0
 
-    documents = build_documents(df)
+    documents, texts = _build_batch_timed(df)
+    del df
 
-    # OpenSearch
     ensure_index()
-    index_documents(documents)
-
-    # Qdrant
     encoder = EmbeddingEncoder()
     ensure_collection(encoder.dimension)
-    texts = build_texts_for_embedding(documents)
-    vectors = encoder.encode(texts)
-    ids = [d["invoice_id"] for d in documents]
-    upsert_vectors(ids=ids, vectors=vectors, payloads=documents)
+    _index_batch(documents, texts, encoder)
+    _finish_encoding(encoder)
+    flush_documents()
+    flush_vectors()
     return len(documents)
 
 
+def run_index_pipeline(
+    s3_prefix: str | None = None,
+    stream: Optional[bool] = None,
+    chunk_size: Optional[int] = None,
+    incremental: Optional[bool] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    keys: Optional[Sequence[str]] = None,
+    shard_index: Optional[int] = None,
+    shard_count: Optional[int] = None,
+    fast_load: Optional[bool] = None,
+) -> int:
+    # keys, or shard_index/shard_count over the listing of s3_prefix, restrict the run to
+    # a subset of the objects so several workers can index one prefix in parallel.
+    settings = get_settings()
+    date_from = date_from or settings.pipeline.index_date_from
+    date_to = date_to or settings.pipeline.index_date_to
+    if shard_index is not None:
+        keys = shard_keys(shard_index, shard_count or settings.pipeline.index_shard_count, prefix=s3_prefix)
+    use_incremental = settings.pipeline.index_incremental if incremental is None else incremental
+    if use_incremental and keys is not None:
+        # One manifest covers the whole prefix; concurrent shards would overwrite each other's
+        raise ValueError("Incremental indexing runs over the whole prefix and cannot be restricted to keys or shards")
+    use_streaming = settings.pipeline.index_streaming if stream is None else stream
+    # Shards share the index settings, so for them fast load is toggled once around all
+    # shards (see the DAGs) rather than by each run
+    use_fast_load = settings.pipeline.index_fast_load and keys is None if fast_load is None else fast_load
+    mode = "incremental" if use_incremental else "streaming" if use_streaming else "full"
+    try:
+        with get_metrics().span("index_run", mode=mode), fast_load_documents() if use_fast_load else nullcontext():
+            if use_incremental:
+                return _run_incremental(s3_prefix, chunk_size or settings.pipeline.index_chunk_size, date_from, date_to)
+            if use_streaming:
+                return _run_streaming(s3_prefix, chunk_size or settings.pipeline.index_chunk_size, date_from, date_to, keys)
+            return _run_full(s3_prefix, date_from, date_to, keys)
+    finally:
+        # Also after a failed run: it may have written part of its documents
+        bump_index_generation()
+        export_metrics()
+
+
+def finalize_index(expected: Optional[int] = None) -> Dict[str, int]:
+    # After parallel shard runs: make the documents searchable and check that OpenSearch
+    # and Qdrant hold the same documents, and at least as many as the shards reported
+    # (fewer means a shard lost writes or an invoice_id repeats across objects; more is
+    # left over from earlier runs).
+    refresh_documents()
+    counts = {"opensearch": count_documents(), "qdrant": count_vectors()}
+    if expected is not None:
+        counts["expected"] = expected
+    logger.info("Index counts after finalize: %s", counts)
+    if counts["opensearch"] != counts["qdrant"]:
+        raise RuntimeError(f"OpenSearch and Qdrant document counts differ: {counts}")
+    if expected is not None and counts["opensearch"] < expected:
+        raise RuntimeError(f"Indexed fewer documents than the shards reported: {counts}")
+    return counts
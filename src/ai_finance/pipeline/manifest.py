@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from ai_finance.ingestion.s3_ingest import get_s3_client
+
+
+def document_hash(document: Dict[str, Any]) -> str:
+    # Covers the embedding text fields and the stored payload, so date-only edits are reindexed too
+    payload = json.dumps(document, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def _split_s3_uri(uri: str) -> Tuple[str, str]:
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    return bucket, key
+
+
+class IndexManifest:
+    # objects: S3 key -> {"etag", "last_modified", "size", "docs": {invoice_id: document_hash}}
+    def __init__(self, objects: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.objects: Dict[str, Dict[str, Any]] = objects or {}
+
+    @classmethod
+    def load(cls, path: str, s3_client=None) -> "IndexManifest":
+        if path.startswith("s3://"):
+            bucket, key = _split_s3_uri(path)
+            s3 = s3_client or get_s3_client()
+            try:
+                body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            except s3.exceptions.NoSuchKey:
+                return cls()
+            return cls._from_json(json.loads(body))
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls._from_json(json.load(f))
+
+    @classmethod
+    def _from_json(cls, data: Dict[str, Any]) -> "IndexManifest":
+        return cls(data.get("objects", {}))
+
+    def _to_json(self) -> Dict[str, Any]:
+        return {"version": 1, "objects": self.objects}
+
+    def save(self, path: str, s3_client=None) -> None:
+        body = json.dumps(self._to_json())
+        if path.startswith("s3://"):
+            bucket, key = _split_s3_uri(path)
+            s3 = s3_client or get_s3_client()
+            s3.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"))
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    def is_unchanged(self, obj: Dict[str, Any]) -> bool:
+        entry = self.objects.get(obj["key"])
+        if entry is None:
+            return False
+        return entry.get("etag") == obj.get("etag") and entry.get("last_modified") == obj.get("last_modified")
+
+    def document_hashes(self) -> Dict[str, str]:
+        hashes: Dict[str, str] = {}
+        for entry in self.objects.values():
+            hashes.update(entry.get("docs", {}))
+        return hashes
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ai_finance.config import get_settings
+from ai_finance.embedding.encoder import EmbeddingEncoder
+from ai_finance.ingestion.s3_ingest import get_s3_client, invoice_columns, iter_s3_objects, list_s3_objects
+from ai_finance.matching.algorithm import MatchCandidate, MatchRequest, _build_query_text, multistage_match_batch
+from ai_finance.metrics import export_metrics, get_metrics
+from ai_finance.pipeline.index_pipeline import documents_from_columns
+from ai_finance.pipeline.generation import get_index_generation
+from ai_finance.pipeline.manifest import IndexManifest, _split_s3_uri
+
+logger = logging.getLogger(__name__)
+
+MATCH_COLUMNS = (
+    "source_invoice_id",
+    "rank",
+    "invoice_id",
+    "bm25_score",
+    "vector_score",
+    "blended_score",
+    "guest_name",
+    "hotel_name",
+    "check_in_date",
+    "check_out_date",
+)
+PARTITION_COLUMN = "check_in_month"
+
+
+class MatchCheckpoint(IndexManifest):
+    # Stored like the index manifest. objects: source key -> {"etag", "last_modified",
+    # "parts", "complete", "paths"}, where "parts" counts the chunks already written, in
+    # order, and "paths" lists the files they went to. generation is the index generation
+    # the matches were computed against; a checkpoint from another generation is stale.
+    def __init__(self, objects: Optional[Dict[str, Dict[str, Any]]] = None, generation: Optional[str] = None):
+        super().__init__(objects)
+        self.generation = generation
+
+    @classmethod
+    def _from_json(cls, data: Dict[str, Any]) -> "MatchCheckpoint":
+        return cls(data.get("objects", {}), data.get("generation"))
+
+    def _to_json(self) -> Dict[str, Any]:
+        return {**super()._to_json(), "generation": self.generation}
+
+
+def _partition_value(check_in: Any) -> str:
+    text = str(check_in or "")
+    return text[:7] if len(text) >= 7 and text[4] == "-" else "unknown"
+
+
+def match_rows(documents: Sequence[Dict], results: Sequence[List[MatchCandidate]], top_n: int) -> pd.DataFrame:
+    # One row per (source invoice, candidate) for the top_n candidates, ranked from 1
+    rows: Dict[str, List[Any]] = {c: [] for c in MATCH_COLUMNS + (PARTITION_COLUMN,)}
+    for doc, candidates in zip(documents, results):
+        partition = _partition_value(doc.get("check_in_date"))
+        for rank, c in enumerate(candidates[:top_n] if top_n else candidates, start=1):
+            rows["source_invoice_id"].append(doc.get("invoice_id"))
+            rows["rank"].append(rank)
+            rows["invoice_id"].append(c.invoice_id)
+            rows["bm25_score"].append(c.bm25_score)
+            rows["vector_score"].append(c.vector_score)
+            rows["blended_score"].append(c.blended_score)
+            for field in ("guest_name", "hotel_name", "check_in_date", "check_out_date"):
+                value = c.payload.get(field)
+                rows[field].append(None if value is None else str(value))
+            rows[PARTITION_COLUMN].append(partition)
+    frame = pd.DataFrame(rows)
+    return frame.astype({"rank": "int32", "bm25_score": "float64", "vector_score": "float64", "blended_score": "float64"})
+
+
+def _write_parquet(path: str, table: pa.Table, s3_client=None) -> None:
+    if path.startswith("s3://"):
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        bucket, key = _split_s3_uri(path)
+        (s3_client or get_s3_client()).put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _delete_paths(paths: Sequence[str], s3_client=None) -> None:
+    for path in paths:
+        if path.startswith("s3://"):
+            bucket, key = _split_s3_uri(path)
+            (s3_client or get_s3_client()).delete_object(Bucket=bucket, Key=key)
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_partitioned(frame: pd.DataFrame, output_path: str, part_name: str, s3_client=None) -> List[str]:
+    # Hive-style check_in_month=YYYY-MM/ directories. Part names are deterministic, so a
+    # chunk that is redone after a failure overwrites its earlier files instead of duplicating rows.
+    paths: List[str] = []
+    for partition, group in frame.groupby(PARTITION_COLUMN, sort=True):
+        path = f"{output_path.rstrip('/')}/{PARTITION_COLUMN}={partition}/{part_name}.parquet"
+        table = pa.Table.from_pandas(group.drop(columns=[PARTITION_COLUMN]), preserve_index=False)
+        _write_parquet(path, table, s3_client=s3_client)
+        paths.append(path)
+    return paths
+
+
+def _iter_parts(frames, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # Fixed-size chunks across an object's frames, so part numbers are stable between runs
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+    for frame in frames:
+        start = 0
+        while start < len(frame):
+            take = min(chunk_size - pending_rows, len(frame) - start)
+            pending.append(frame.iloc[start:start + take])
+            pending_rows += take
+            start += take
+            if pending_rows == chunk_size:
+                yield pd.concat(pending, ignore_index=True)
+                pending, pending_rows = [], 0
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def _match_part(
+    frame: pd.DataFrame,
+    part_name: str,
+    output_path: str,
+    encoder: EmbeddingEncoder,
+    top_n: int,
+    s3_client=None,
+) -> Tuple[int, List[str]]:
+    metrics = get_metrics()
+    documents = documents_from_columns(invoice_columns(frame))
+    requests = [MatchRequest(query_text=_build_query_text(d), source_doc=d) for d in documents]
+    with metrics.span("match_export_stage", stage="match"):
+        results = multistage_match_batch(requests, encoder=encoder)
+    with metrics.span("match_export_stage", stage="write"):
+        paths = write_partitioned(match_rows(documents, results, top_n), output_path, part_name, s3_client=s3_client)
+    metrics.inc("match_export_invoices_total", len(documents))
+    return len(documents), paths
+
+
+def run_match_pipeline(
+    source_prefix: Optional[str] = None,
+    output_path: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    top_n: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    restart: bool = False,
+    s3_client=None,
+) -> int:
+    # Matches every invoice under source_prefix against the indexes and writes the top_n
+    # candidates per invoice as partitioned Parquet (local directory or s3:// prefix).
+    # Chunks are matched on a thread pool but committed in order: the checkpoint records
+    # how many chunks of each object are written, and a rerun skips exactly those. Output
+    # from a changed or removed object, or from before the last index run, is deleted
+    # and redone.
+    settings = get_settings()
+    # Never the index prefix: matching the indexed corpus against itself is not an export
+    source_prefix = source_prefix or settings.pipeline.match_source_prefix
+    if not source_prefix:
+        raise ValueError("No match source prefix given (MATCH_SOURCE_PREFIX)")
+    output_path = output_path or settings.pipeline.match_output_path
+    checkpoint_path = checkpoint_path or settings.pipeline.match_checkpoint_path or f"{output_path.rstrip('/')}/_checkpoint.json"
+    chunk_size = max(1, chunk_size or settings.pipeline.match_export_chunk_size)
+    workers = max(1, workers or settings.pipeline.match_export_workers)
+    top_n = settings.pipeline.match_export_top_n if top_n is None else top_n
+    s3 = s3_client or get_s3_client()
+    if not checkpoint_path.startswith("s3://") and os.path.dirname(checkpoint_path):
+        os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+
+    generation = get_index_generation()
+    checkpoint = MatchCheckpoint.load(checkpoint_path, s3_client=s3)
+    if restart or checkpoint.generation != generation:
+        # Matched against an older index (or a forced restart): nothing can be reused
+        for entry in checkpoint.objects.values():
+            _delete_paths(entry.get("paths", []), s3_client=s3)
+        checkpoint = MatchCheckpoint(generation=generation)
+    listed = list_s3_objects(prefix=source_prefix, s3_client=s3)
+    listed_keys = {o["key"] for o in listed}
+    for key in [k for k in checkpoint.objects if k not in listed_keys]:
+        _delete_paths(checkpoint.objects.pop(key).get("paths", []), s3_client=s3)
+    for obj in listed:
+        if not checkpoint.is_unchanged(obj):
+            # New or modified since its chunks were written: drop its old files (the new
+            # contents may not reach every old part or partition) and redo the whole object
+            previous = checkpoint.objects.get(obj["key"])
+            if previous is not None:
+                _delete_paths(previous.get("paths", []), s3_client=s3)
+            checkpoint.objects[obj["key"]] = {
+                "etag": obj.get("etag"),
+                "last_modified": obj.get("last_modified"),
+                "parts": 0,
+                "complete": False,
+                "paths": [],
+            }
+    checkpoint.save(checkpoint_path, s3_client=s3)
+    todo = [o["key"] for o in listed if not checkpoint.objects[o["key"]].get("complete")]
+    logger.info("Match export: %d/%d objects to process", len(todo), len(listed))
+
+    encoder = EmbeddingEncoder()
+    total = 0
+    started = time.perf_counter()
+    pending: Deque[Tuple[str, bool, Future]] = deque()
+
+    def commit(key: str, last: bool, future: Future) -> None:
+        nonlocal total
+        count, paths = future.result()
+        total += count
+        entry = checkpoint.objects[key]
+        entry["parts"] += 1
+        known = entry.setdefault("paths", [])
+        known.extend(p for p in paths if p not in known)
+        entry["complete"] = last
+        checkpoint.save(checkpoint_path, s3_client=s3)
+
+    try:
+        with get_metrics().span("match_export_run"), ThreadPoolExecutor(max_workers=workers, thread_name_prefix="match-export") as pool:
+            for key, frames in iter_s3_objects(todo, s3_client=s3, date_from=date_from, date_to=date_to):
+                object_id = hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+                done = checkpoint.objects[key]["parts"]
+                part_no = -1
+                parts = _iter_parts(frames, chunk_size)
+                part = next(parts, None)
+                while part is not None:
+                    part_no += 1
+                    following = next(parts, None)
+                    if part_no >= done:
+                        future = pool.submit(_match_part, part, f"part-{object_id}-{part_no:05d}", output_path, encoder, top_n, s3)
+                        pending.append((key, following is None, future))
+                    while len(pending) > workers * 2 or (pending and pending[0][2].done()):
+                        commit(*pending.popleft())
+                    part = following
+                if part_no < 0 or part_no < done:
+                    # Empty object, or every chunk was already written
+                    checkpoint.objects[key]["complete"] = True
+                    checkpoint.save(checkpoint_path, s3_client=s3)
+                logger.info("Match export: %s queued (%d invoices written, %.1f/s)", key, total, total / max(time.perf_counter() - started, 1e-9))
+            while pending:
+                commit(*pending.popleft())
+    finally:
+        encoder.close()
+        export_metrics()
+    logger.info("Match export finished: %d invoices in %.1fs", total, time.perf_counter() - started)
+    return total
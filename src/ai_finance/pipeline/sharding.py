@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import heapq
+from typing import Any, Dict, List, Optional, Sequence
+
+from ai_finance.ingestion.s3_ingest import list_s3_objects
+
+
+def plan_shards(objects: Sequence[Dict[str, Any]], shard_count: int) -> List[List[str]]:
+    # Greedy longest-first split by object size: each object goes to the shard with the
+    # fewest bytes so far. Deterministic for a given listing, so every task of a run can
+    # rebuild the same plan; keys stay in listing order within a shard.
+    shard_count = max(1, shard_count)
+    loads = [(0, i) for i in range(shard_count)]
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    for obj in sorted(objects, key=lambda o: (-int(o.get("size") or 0), o["key"])):
+        load, i = heapq.heappop(loads)
+        shards[i].append(obj["key"])
+        # Empty objects still cost a request, so they spread by count
+        heapq.heappush(loads, (load + max(1, int(obj.get("size") or 0)), i))
+    return [sorted(keys) for keys in shards]
+
+
+def shard_keys(shard_index: int, shard_count: int, prefix: Optional[str] = None, s3_client=None) -> List[str]:
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index must be in [0, {shard_count}), got {shard_index}")
+    return plan_shards(list_s3_objects(prefix, s3_client=s3_client), shard_count)[shard_index]
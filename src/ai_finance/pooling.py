@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+_instances: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+class ProcessLocal(Generic[T]):
+    # Lazily built, process-wide object (e.g. a pooled client). It is rebuilt in forked
+    # children (Airflow task runners, multiprocessing workers) instead of sharing sockets.
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        _instances.add(self)
+
+    def get(self) -> T:
+        pid = os.getpid()
+        value = self._value
+        if value is not None and self._pid == pid:
+            return value
+        with self._lock:
+            if self._value is None or self._pid != pid:
+                self._value = self._factory()
+                self._pid = pid
+            return self._value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = None
+            self._pid = None
+
+    def set(self, value: T) -> None:
+        with self._lock:
+            self._value = value
+            self._pid = os.getpid()
+
+    def _after_fork(self) -> None:
+        # The parent's connections must not be closed or reused from the child
+        self._lock = threading.Lock()
+        self._value = None
+        self._pid = None
+
+
+class LoopLocal(Generic[T]):
+    # Async clients are bound to the event loop that created them, so one is kept per loop
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._values: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        _instances.add(self)
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        value = self._values.get(loop)
+        if value is None:
+            value = self._factory()
+            self._values[loop] = value
+        return value
+
+    def pop(self) -> Optional[T]:
+        return self._values.pop(asyncio.get_running_loop(), None)
+
+    def _after_fork(self) -> None:
+        self._values = weakref.WeakKeyDictionary()
+
+
+def _reset_after_fork() -> None:
+    for instance in list(_instances):
+        instance._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
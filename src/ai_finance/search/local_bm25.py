@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_finance.matching.rerank import to_day_array
+
+# Same fields and boosts as the multi_match query in opensearch_client
+FIELD_BOOSTS: Dict[str, float] = {"guest_name": 3.0, "hotel_name": 2.0, "hotel_address": 1.0, "notes": 1.0}
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def analyze(text: Any) -> List[str]:
+    # Mirrors the "folding" analyzer: standard tokenizer + lowercase + asciifolding
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return []
+    folded = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return _TOKEN_RE.findall(folded.lower())
+
+
+class _FieldPostings:
+    # Compressed sparse rows: postings of term t are doc_ids[offsets[t]:offsets[t + 1]]
+    def __init__(self, vocab: Dict[str, int], offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray, lengths: np.ndarray):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        has_field = lengths > 0
+        self.doc_count = int(has_field.sum())
+        self.avg_length = float(lengths[has_field].mean()) if self.doc_count else 0.0
+        self._norm: Optional[np.ndarray] = None
+
+    @classmethod
+    def build(cls, token_lists: List[List[str]]) -> "_FieldPostings":
+        vocab: Dict[str, int] = {}
+        per_term: List[List[Tuple[int, int]]] = []
+        lengths = np.zeros(len(token_lists), dtype=np.int32)
+        for doc, tokens in enumerate(token_lists):
+            lengths[doc] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                tid = vocab.setdefault(term, len(vocab))
+                if tid == len(per_term):
+                    per_term.append([])
+                per_term[tid].append((doc, tf))
+        offsets = np.zeros(len(per_term) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in per_term])
+        doc_ids = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.float32)
+        for tid, postings in enumerate(per_term):
+            if postings:
+                arr = np.asarray(postings, dtype=np.int64)
+                doc_ids[offsets[tid]:offsets[tid + 1]] = arr[:, 0]
+                tfs[offsets[tid]:offsets[tid + 1]] = arr[:, 1]
+        return cls(vocab, offsets, doc_ids, tfs, lengths)
+
+    def score(self, terms: Sequence[str], n_docs: int, k1: float, b: float) -> np.ndarray:
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not self.doc_count:
+            return scores
+        if self._norm is None:
+            self._norm = (k1 * (1.0 - b + b * self.lengths / self.avg_length)).astype(np.float32)
+        norm = self._norm
+        for term in terms:
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            start, end = self.offsets[tid], self.offsets[tid + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            df = end - start
+            # Lucene BM25 (as used by OpenSearch): idf * tf / (tf + k1 * (1 - b + b * dl / avgdl))
+            idf = np.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+            scores[docs] += (idf * tf / (tf + norm[docs])).astype(np.float32)
+        return scores
+
+
+class LocalBM25Index:
+    # Embedded lexical backend with the same query semantics as search_bm25: a best_fields
+    # multi_match over the boosted text fields, an optional hotel_name match clause and
+    # check-in/check-out range filters.
+    DOCS_FILE = "documents.jsonl"
+    POSTINGS_FILE = "postings.npz"
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._docs: List[Optional[Dict[str, Any]]] = []
+        self._ids: List[str] = []
+        self._pos: Dict[str, int] = {}
+        self._fields: Dict[str, _FieldPostings] = {}
+        self._check_in = np.empty(0, dtype="datetime64[D]")
+        self._check_out = np.empty(0, dtype="datetime64[D]")
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return sum(1 for d in self._docs if d is not None)
+
+    def index(self, documents: Sequence[Dict[str, Any]]) -> None:
+        with self._lock:
+            for doc in documents:
+                _id = str(doc.get("invoice_id"))
+                row = self._pos.get(_id)
+                if row is None:
+                    self._pos[_id] = len(self._docs)
+                    self._ids.append(_id)
+                    self._docs.append(dict(doc))
+                else:
+                    self._docs[row] = dict(doc)
+            self._dirty = True
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            for _id in ids:
+                row = self._pos.get(str(_id))
+                if row is not None:
+                    self._docs[row] = None
+            self._dirty = True
+
+    def refresh(self) -> None:
+        # Rebuilds the postings from the live documents; called lazily before searching
+        with self._lock:
+            if not self._dirty:
+                return
+            live = [i for i, d in enumerate(self._docs) if d is not None]
+            self._docs = [self._docs[i] for i in live]
+            self._ids = [self._ids[i] for i in live]
+            self._pos = {_id: i for i, _id in enumerate(self._ids)}
+            self._fields = {
+                field: _FieldPostings.build([analyze(d.get(field)) for d in self._docs])
+                for field in FIELD_BOOSTS
+            }
+            self._check_in = to_day_array([d.get("check_in_date") for d in self._docs])
+            self._check_out = to_day_array([d.get("check_out_date") for d in self._docs])
+            self._dirty = False
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 20,
+        hotel_name: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        with self._lock:
+            self.refresh()
+            n = len(self._docs)
+            if n == 0:
+                return []
+            mask = np.ones(n, dtype=bool)
+            scores = np.zeros(n, dtype=np.float32)
+            clauses = 0
+            terms = analyze(query) if query else []
+            if query:
+                clauses += 1
+                # best_fields with tie_breaker 0: the best boosted field score per document
+                best = np.zeros(n, dtype=np.float32)
+                for field, boost in FIELD_BOOSTS.items():
+                    np.maximum(best, boost * self._fields[field].score(terms, n, self.k1, self.b), out=best)
+                mask &= best > 0
+                scores += best
+            if hotel_name:
+                clauses += 1
+                hotel = self._fields["hotel_name"].score(analyze(hotel_name), n, self.k1, self.b)
+                mask &= hotel > 0
+                scores += hotel
+            if not clauses:
+                scores[:] = 1.0  # match_all
+            if date_from:
+                lower = to_day_array([date_from])[0]
+                mask &= ~np.isnat(self._check_in) & (self._check_in >= lower)
+            if date_to:
+                upper = to_day_array([date_to])[0]
+                mask &= ~np.isnat(self._check_out) & (self._check_out <= upper)
+
+            matched = np.flatnonzero(mask)
+            if top_k < len(matched):
+                matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+            order = matched[np.lexsort((matched, -scores[matched]))]
+            return [(self._ids[i], float(scores[i]), dict(self._docs[i])) for i in order.tolist()]
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given for the local BM25 index snapshot")
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self.refresh()
+            with open(os.path.join(path, self.DOCS_FILE), "w", encoding="utf-8") as f:
+                for doc in self._docs:
+                    f.write(json.dumps(doc, default=str))
+                    f.write("\n")
+            arrays: Dict[str, np.ndarray] = {}
+            vocabs: Dict[str, List[str]] = {}
+            for field, postings in self._fields.items():
+                arrays[f"{field}.offsets"] = postings.offsets
+                arrays[f"{field}.doc_ids"] = postings.doc_ids
+                arrays[f"{field}.tfs"] = postings.tfs
+                arrays[f"{field}.lengths"] = postings.lengths
+                vocabs[field] = sorted(postings.vocab, key=postings.vocab.__getitem__)
+            arrays["vocab"] = np.frombuffer(json.dumps(vocabs).encode("utf-8"), dtype=np.uint8)
+            np.savez(os.path.join(path, self.POSTINGS_FILE), **arrays)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str) -> "LocalBM25Index":
+        index = cls(path)
+        docs_path = os.path.join(path, cls.DOCS_FILE)
+        if not os.path.exists(docs_path):
+            return index
+        with open(docs_path, "r", encoding="utf-8") as f:
+            index._docs = [json.loads(line) for line in f]
+        index._ids = [str(d.get("invoice_id")) for d in index._docs]
+        index._pos = {_id: i for i, _id in enumerate(index._ids)}
+        with np.load(os.path.join(path, cls.POSTINGS_FILE)) as data:
+            vocabs = json.loads(data["vocab"].tobytes().decode("utf-8"))
+            for field in FIELD_BOOSTS:
+                index._fields[field] = _FieldPostings(
+                    {term: i for i, term in enumerate(vocabs.get(field, []))},
+                    data[f"{field}.offsets"],
+                    data[f"{field}.doc_ids"],
+                    data[f"{field}.tfs"],
+                    data[f"{field}.lengths"],
+                )
+        index._check_in = to_day_array([d.get("check_in_date") for d in index._docs])
+        index._check_out = to_day_array([d.get("check_out_date") for d in index._docs])
+        return index
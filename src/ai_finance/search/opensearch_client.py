@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ai_finance.config import get_settings
+from ai_finance.metrics import get_metrics
+from ai_finance.pooling import LoopLocal, ProcessLocal
+from ai_finance.search.local_bm25 import LocalBM25Index
+
+if TYPE_CHECKING:
+    from opensearchpy import AsyncOpenSearch, OpenSearch
+
+logger = logging.getLogger(__name__)
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    s = get_settings()
+    auth = (s.opensearch.username, s.opensearch.password) if s.opensearch.username else None
+    return dict(
+        hosts=[{"host": s.opensearch.host.replace("http://", "").replace("https://", ""), "port": s.opensearch.port}],
+        http_auth=auth,
+        use_ssl=s.opensearch.host.startswith("https://"),
+        verify_certs=False,
+        ssl_show_warn=False,
+        timeout=s.opensearch.timeout,
+        max_retries=s.opensearch.max_retries,
+        retry_on_timeout=s.opensearch.retry_on_timeout,
+        retry_on_status=(429, 502, 503, 504),
+    )
+
+
+def _create_opensearch() -> OpenSearch:
+    # opensearchpy is imported on first client use, not when matching modules are imported
+    from opensearchpy import OpenSearch
+
+    s = get_settings()
+    return OpenSearch(pool_maxsize=s.opensearch.pool_maxsize, **_client_kwargs())
+
+
+def _create_async_opensearch() -> AsyncOpenSearch:
+    # Uses the aiohttp-based connection class; requires the opensearch-py[async] extra
+    from opensearchpy import AsyncOpenSearch
+
+    s = get_settings()
+    return AsyncOpenSearch(maxsize=s.opensearch.pool_maxsize, **_client_kwargs())
+
+
+def _open_local_index() -> LocalBM25Index:
+    return LocalBM25Index.load(get_settings().opensearch.local_path)
+
+
+_opensearch = ProcessLocal(_create_opensearch)
+_async_opensearch = LoopLocal(_create_async_opensearch)
+_local_index = ProcessLocal(_open_local_index)
+
+
+def _use_local() -> bool:
+    return get_settings().opensearch.backend == "local"
+
+
+def get_local_index() -> LocalBM25Index:
+    return _local_index.get()
+
+
+def reset_local_index() -> None:
+    # The next call reloads the snapshot from the configured local_path
+    _local_index.reset()
+
+
+def get_opensearch() -> OpenSearch:
+    # One keep-alive connection pool per process, shared by all callers
+    return _opensearch.get()
+
+
+def reset_opensearch() -> None:
+    _opensearch.reset()
+
+
+def get_async_opensearch() -> AsyncOpenSearch:
+    return _async_opensearch.get()
+
+
+async def close_async_opensearch() -> None:
+    client = _async_opensearch.pop()
+    if client is not None:
+        await client.close()
+
+
+def ensure_index() -> None:
+    if _use_local():
+        get_local_index()
+        return
+    s = get_settings()
+    client = get_opensearch()
+    if not client.indices.exists(index=s.opensearch.index_name):
+        body = {
+            "settings": {
+                "index": {
+                    "number_of_shards": 1,
+                    "number_of_replicas": 0
+                },
+                "analysis": {
+                    "analyzer": {
+                        "folding": {
+                            "tokenizer": "standard",
+                            "filter": ["lowercase", "asciifolding"]
+                        }
+                    }
+                }
+            },
+            "mappings": {
+                "properties": {
+                    "invoice_id": {"type": "keyword"},
+                    "guest_name": {"type": "text", "analyzer": "folding"},
+                    "hotel_name": {"type": "text", "analyzer": "folding"},
+                    "hotel_address": {"type": "text", "analyzer": "folding"},
+                    "notes": {"type": "text", "analyzer": "folding"},
+                    "check_in_date": {"type": "date", "format": "yyyy-MM-dd||strict_date_optional_time"},
+                    "check_out_date": {"type": "date", "format": "yyyy-MM-dd||strict_date_optional_time"}
+                }
+            }
+        }
+        client.indices.create(index=s.opensearch.index_name, body=body)
+
+
+@dataclass
+class BulkResult:
+    succeeded: int = 0
+    retried: int = 0
+    # One {op_type: item} per action that still failed after the retries
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _item_status(op_type: str, item: Dict[str, Any]) -> Tuple[Optional[int], bool]:
+    # None when the item's whole chunk failed at the transport level (unreachable cluster,
+    # timeout): parallel_bulk then reports the connection error's status, "N/A"
+    try:
+        status = int(item.get("status") or 500)
+    except (TypeError, ValueError):
+        return None, False
+    # Deleting a document that is already gone is not a failure
+    return status, 200 <= status < 300 or (op_type == "delete" and status == 404)
+
+
+def bulk_write(actions: List[Dict[str, Any]]) -> BulkResult:
+    # Streams the actions through parallel_bulk in chunks capped by count and bytes, then
+    # resends only the items rejected with 429 (or whose whole chunk was rejected or never
+    # reached the cluster), with exponential backoff. Other failures are reported per item
+    # and are not retried.
+    from opensearchpy import helpers
+
+    s = get_settings()
+    client = get_opensearch()
+    metrics = get_metrics()
+    result = BulkResult()
+    pending = actions
+    for attempt in range(s.opensearch.bulk_max_retries + 1):
+        rejected: List[Dict[str, Any]] = []
+        responses = helpers.parallel_bulk(
+            client,
+            pending,
+            thread_count=max(1, s.opensearch.bulk_threads),
+            chunk_size=max(1, s.opensearch.bulk_chunk_size),
+            max_chunk_bytes=s.opensearch.bulk_max_bytes,
+            raise_on_error=False,
+            raise_on_exception=False,
+        )
+        # Results come back in action order, including for chunks that failed as a whole
+        for action, (_, response) in zip(pending, responses):
+            op_type, item = next(iter(response.items()))
+            status, ok = _item_status(op_type, item)
+            if ok:
+                result.succeeded += 1
+            elif (status == 429 or status is None) and attempt < s.opensearch.bulk_max_retries:
+                rejected.append(action)
+            else:
+                item.pop("exception", None)
+                result.errors.append({op_type: item})
+        if not rejected:
+            break
+        result.retried += len(rejected)
+        metrics.inc("opensearch_bulk_retries_total", len(rejected))
+        delay = min(s.opensearch.bulk_max_backoff, s.opensearch.bulk_initial_backoff * 2 ** attempt)
+        logger.warning("OpenSearch rejected or did not receive %d bulk items; retrying in %.1fs", len(rejected), delay)
+        time.sleep(delay)
+        pending = rejected
+
+    metrics.inc("opensearch_bulk_items_total", result.succeeded)
+    if result.errors:
+        metrics.inc("opensearch_bulk_errors_total", len(result.errors))
+        logger.error("%d bulk items failed; first error: %s", len(result.errors), result.errors[0])
+        if s.opensearch.bulk_raise_on_error:
+            raise helpers.BulkIndexError(f"{len(result.errors)} document(s) failed to index.", result.errors)
+    return result
+
+
+def index_documents(documents: List[Dict[str, Any]]) -> Optional[BulkResult]:
+    # Documents become searchable on the index refresh interval (or flush_documents)
+    if _use_local():
+        get_local_index().index(documents)
+        return None
+    s = get_settings()
+    return bulk_write([
+        {"_op_type": "index", "_index": s.opensearch.index_name, "_id": doc.get("invoice_id"), "_source": doc}
+        for doc in documents
+    ])
+
+
+def delete_documents(ids: Sequence[str]) -> Optional[BulkResult]:
+    if _use_local():
+        get_local_index().delete(ids)
+        return None
+    s = get_settings()
+    return bulk_write([{"_op_type": "delete", "_index": s.opensearch.index_name, "_id": _id} for _id in ids])
+
+
+def flush_documents() -> None:
+    # Persists the embedded index snapshot; on the cluster, makes the bulk writes searchable
+    if _use_local():
+        get_local_index().save(get_settings().opensearch.local_path)
+        return
+    refresh_documents()
+
+
+def begin_fast_load() -> Dict[str, Any]:
+    # Turns off periodic refresh and replicas for a large load and returns the previous
+    # values for end_fast_load. Call both once around the whole load, not per worker.
+    if _use_local():
+        return {}
+    ensure_index()
+    s = get_settings()
+    client = get_opensearch()
+    current = client.indices.get_settings(index=s.opensearch.index_name, flat_settings=True)
+    index_settings = next(iter(current.values()))["settings"]
+    previous = {
+        "index.refresh_interval": index_settings.get("index.refresh_interval"),
+        "index.number_of_replicas": index_settings.get("index.number_of_replicas"),
+    }
+    client.indices.put_settings(
+        index=s.opensearch.index_name,
+        body={"index.refresh_interval": "-1", "index.number_of_replicas": 0},
+    )
+    logger.info("Fast load enabled on %s (was %s)", s.opensearch.index_name, previous)
+    return previous
+
+
+def end_fast_load(previous: Dict[str, Any]) -> None:
+    # A None value resets the setting to the index default
+    if not _use_local() and previous:
+        s = get_settings()
+        get_opensearch().indices.put_settings(index=s.opensearch.index_name, body=previous)
+    refresh_documents()
+
+
+@contextmanager
+def fast_load_documents() -> Iterator[None]:
+    previous = begin_fast_load()
+    try:
+        yield
+    finally:
+        end_fast_load(previous)
+
+
+def refresh_documents() -> None:
+    # Makes everything indexed so far searchable (and countable)
+    if _use_local():
+        get_local_index().refresh()
+        return
+    get_opensearch().indices.refresh(index=get_settings().opensearch.index_name)
+
+
+def count_documents() -> int:
+    if _use_local():
+        return len(get_local_index())
+    res = get_opensearch().count(index=get_settings().opensearch.index_name)
+    return int(res["count"])
+
+
+def _build_bm25_body(
+    query: str,
+    top_k: int,
+    hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    must: List[Dict[str, Any]] = []
+    if query:
+        must.append({
+            "multi_match": {
+                "query": query,
+                "fields": ["guest_name^3", "hotel_name^2", "hotel_address", "notes"],
+                "type": "best_fields"
+            }
+        })
+    if hotel_name:
+        must.append({"match": {"hotel_name": {"query": hotel_name}}})
+    range_filter: Dict[str, Any] = {}
+    if date_from:
+        range_filter.setdefault("check_in_date", {})["gte"] = date_from
+    if date_to:
+        range_filter.setdefault("check_out_date", {})["lte"] = date_to
+    filters: List[Dict[str, Any]] = []
+    if range_filter:
+        filters.append({"range": range_filter})
+    return {
+        "query": {
+            "bool": {
+                "must": must or [{"match_all": {}}],
+                "filter": filters
+            }
+        },
+        "size": top_k
+    }
+
+
+def _parse_hits(res: Dict[str, Any]) -> List[Tuple[str, float, Dict[str, Any]]]:
+    hits = res.get("hits", {}).get("hits", [])
+    out: List[Tuple[str, float, Dict[str, Any]]] = []
+    for h in hits:
+        out.append((h["_id"], float(h.get("_score") or 0.0), h.get("_source", {})))
+    return out
+
+
+def search_bm25(
+    query: str,
+    top_k: int = 20,
+    hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[Tuple[str, float, Dict[str, Any]]]:
+    if _use_local():
+        return get_local_index().search(query, top_k, hotel_name=hotel_name, date_from=date_from, date_to=date_to)
+    s = get_settings()
+    client = get_opensearch()
+    body = _build_bm25_body(query, top_k, hotel_name=hotel_name, date_from=date_from, date_to=date_to)
+    res = client.search(index=s.opensearch.index_name, body=body)
+    return _parse_hits(res)
+
+
+async def search_bm25_async(
+    query: str,
+    top_k: int = 20,
+    hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[Tuple[str, float, Dict[str, Any]]]:
+    if _use_local():
+        return get_local_index().search(query, top_k, hotel_name=hotel_name, date_from=date_from, date_to=date_to)
+    s = get_settings()
+    client = get_async_opensearch()
+    body = _build_bm25_body(query, top_k, hotel_name=hotel_name, date_from=date_from, date_to=date_to)
+    res = await client.search(index=s.opensearch.index_name, body=body)
+    return _parse_hits(res)
+
+
+def search_bm25_batch(
+    queries: Sequence[Dict[str, Any]],
+    top_k: int = 20,
+) -> List[List[Tuple[str, float, Dict[str, Any]]]]:
+    # Each query is a dict with "query" and optional "hotel_name", "date_from", "date_to";
+    # all of them are sent as a single _msearch request.
+    if not queries:
+        return []
+    if _use_local():
+        index = get_local_index()
+        return [
+            index.search(
+                q.get("query") or "",
+                top_k,
+                hotel_name=q.get("hotel_name"),
+                date_from=q.get("date_from"),
+                date_to=q.get("date_to"),
+            )
+            for q in queries
+        ]
+    s = get_settings()
+    client = get_opensearch()
+    body: List[Dict[str, Any]] = []
+    for q in queries:
+        body.append({"index": s.opensearch.index_name})
+        body.append(
+            _build_bm25_body(
+                q.get("query") or "",
+                top_k,
+                hotel_name=q.get("hotel_name"),
+                date_from=q.get("date_from"),
+                date_to=q.get("date_to"),
+            )
+        )
+    res = client.msearch(body=body)
+    out: List[List[Tuple[str, float, Dict[str, Any]]]] = []
+    for item in res.get("responses", []):
+        if "error" in item:
+            raise RuntimeError(f"OpenSearch msearch item failed: {item['error']}")
+        out.append(_parse_hits(item))
+    return out
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field, field_validator
+
+from ai_finance.config import get_settings
+from ai_finance.embedding.registry import warm_up
+from ai_finance.matching.algorithm import MatchRequest, _build_query_text
+from ai_finance.matching.cache import get_match_cache
+from ai_finance.matching.rerank import to_timestamp_bound
+from ai_finance.serving.batcher import BatcherOverloaded, MatchBatcher
+
+logger = logging.getLogger(__name__)
+
+
+class MatchBody(BaseModel):
+    source_doc: Dict[str, Any]
+    # Defaults to the same salient fields the query vector is built from
+    query_text: Optional[str] = None
+    hotel_name: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+    @field_validator("date_from", "date_to")
+    @classmethod
+    def _valid_date(cls, value: Optional[str]) -> Optional[str]:
+        # Rejected here with a 422, not in the matcher, where it would fail the whole micro-batch
+        if value:
+            to_timestamp_bound(value)
+        return value
+
+    def to_request(self) -> MatchRequest:
+        return MatchRequest(
+            query_text=self.query_text or _build_query_text(self.source_doc),
+            source_doc=self.source_doc,
+            hotel_name=self.hotel_name,
+            date_from=self.date_from,
+            date_to=self.date_to,
+        )
+
+
+class MatchBatchBody(BaseModel):
+    requests: List[MatchBody] = Field(default_factory=list)
+
+
+def _warm(batcher: MatchBatcher) -> None:
+    # Loads the model and opens the pooled clients (or loads the local index snapshots)
+    # before the first real request arrives
+    seconds = warm_up(batcher.encoder.model_name, batcher.encoder.backend)
+    logger.info("Embedding model warm in %.2fs", seconds)
+    try:
+        batcher.run_sync([MatchRequest(query_text="warm up", source_doc={"guest_name": "warm up"})])
+    except Exception:
+        logger.warning("Warm-up match failed; backends will connect on first request", exc_info=True)
+
+
+def create_app(batcher: Optional[MatchBatcher] = None) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.batcher = batcher or MatchBatcher()
+        if get_settings().server.warm_up:
+            await asyncio.get_running_loop().run_in_executor(None, _warm, app.state.batcher)
+        await app.state.batcher.start()
+        try:
+            yield
+        finally:
+            await app.state.batcher.stop()
+
+    app = FastAPI(title="ai-finance match server", lifespan=lifespan)
+
+    async def _match(body: MatchBody) -> List[Dict[str, Any]]:
+        try:
+            candidates = await app.state.batcher.submit(body.to_request())
+        except BatcherOverloaded as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+        return [asdict(c) for c in candidates]
+
+    @app.post("/match")
+    async def match(body: MatchBody) -> Dict[str, Any]:
+        return {"candidates": await _match(body)}
+
+    @app.post("/match/batch")
+    async def match_batch(body: MatchBatchBody) -> Dict[str, Any]:
+        # Submitted together, so they share micro-batches with each other and other clients
+        results = await asyncio.gather(*(_match(r) for r in body.requests))
+        return {"results": [{"candidates": c} for c in results]}
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        cache = get_match_cache()
+        return {
+            "batcher": app.state.batcher.stats(),
+            "match_cache": cache.stats() if cache is not None else None,
+            "encoder": app.state.batcher.encoder.throughput(),
+        }
+
+    @app.get("/healthz")
+    async def healthz() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    return app
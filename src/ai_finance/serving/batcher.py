@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ai_finance.config import get_settings
+from ai_finance.embedding.encoder import EmbeddingEncoder
+from ai_finance.matching.algorithm import MatchCandidate, MatchRequest, multistage_match_batch
+from ai_finance.metrics import get_metrics
+
+
+class BatcherOverloaded(RuntimeError):
+    pass
+
+
+class MatchBatcher:
+    # Dynamic micro-batching for online matching. Requests queue up; the collector takes
+    # the first one, keeps collecting for at most max_wait_ms or until max_batch_size,
+    # and hands the batch to multistage_match_batch (one encode, one _msearch, one Qdrant
+    # batch search) on a worker thread. At most `concurrency` batches run at once; while
+    # they do, new requests keep queueing, so batches grow under load instead of latency.
+    def __init__(
+        self,
+        encoder: Optional[EmbeddingEncoder] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        latency_window: int = 10_000,
+    ):
+        settings = get_settings()
+        self.encoder = encoder or EmbeddingEncoder()
+        self.max_batch_size = max(1, max_batch_size or settings.server.max_batch_size)
+        self.max_wait = (settings.server.max_wait_ms if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.concurrency = max(1, concurrency or settings.server.concurrency)
+        self.max_pending = max(1, max_pending or settings.server.max_pending)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="match-batch")
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._batch_sizes: Deque[int] = deque(maxlen=latency_window)
+        self._started_at = time.monotonic()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._started_at = time.monotonic()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    def run_sync(self, requests: List[MatchRequest]) -> List[List[MatchCandidate]]:
+        return multistage_match_batch(requests, encoder=self.encoder, chunk_size=len(requests))
+
+    async def submit(self, request: MatchRequest) -> List[MatchCandidate]:
+        if self._queue is None:
+            raise RuntimeError("MatchBatcher.start() has not been called")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            get_metrics().inc("match_server_rejected_total")
+            raise BatcherOverloaded(f"More than {self.max_pending} match requests pending")
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Whatever is already queued joins without waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[Tuple[MatchRequest, asyncio.Future, float]]) -> None:
+        metrics = get_metrics()
+        try:
+            requests = [item[0] for item in batch]
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self.run_sync, requests)
+        except Exception as exc:  # every waiter in the batch gets the error
+            self.errors += len(batch)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            self._slots.release()
+        done = time.perf_counter()
+        self.batches += 1
+        self.requests += len(batch)
+        self._batch_sizes.append(len(batch))
+        metrics.observe("match_server_batch_size", len(batch))
+        for (_, future, submitted), candidates in zip(batch, results):
+            latency = done - submitted
+            self._latencies.append(latency)
+            metrics.observe("match_server_latency_seconds", latency)
+            if not future.done():
+                future.set_result(candidates)
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self._started_at, 1e-9)
+        latencies = np.array(self._latencies, dtype=np.float64) * 1000.0
+        sizes = np.array(self._batch_sizes, dtype=np.float64)
+        out: Dict[str, Any] = {
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "inflight_batches": len(self._inflight),
+            "uptime_s": elapsed,
+            "requests_per_s": self.requests / elapsed,
+            "mean_batch_size": float(sizes.mean()) if len(sizes) else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "concurrency": self.concurrency,
+        }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            out.update(latency_p50_ms=float(p50), latency_p95_ms=float(p95), latency_p99_ms=float(p99))
+        return out
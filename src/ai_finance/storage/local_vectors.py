@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_finance.matching.rerank import to_timestamp_bound
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class LocalVectorIndex:
+    # In-process stand-in for the Qdrant collection: normalized float32 vectors (cosine
+    # similarity == dot product), an id map and a JSON-lines payload sidecar. Search is
+    # exact brute force through BLAS unless an IVF index has been built.
+    VECTORS_FILE = "vectors.npy"
+    IDS_FILE = "ids.json"
+    PAYLOADS_FILE = "payloads.jsonl"
+    IVF_FILE = "ivf.npz"
+
+    def __init__(self, path: Optional[str] = None, dimension: Optional[int] = None):
+        self.path = path
+        self.dimension = dimension
+        self._vectors = np.empty((0, dimension or 0), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._pos: Dict[str, int] = {}
+        self._payloads: List[Optional[dict]] = []
+        self._alive = np.empty(0, dtype=bool)
+        self._hotels: Optional[np.ndarray] = None
+        self._stays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._lists: Optional[List[np.ndarray]] = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorIndex":
+        index = cls(path)
+        vectors_path = os.path.join(path, cls.VECTORS_FILE)
+        if not os.path.exists(vectors_path):
+            return index
+        # Zero-copy: rows are paged in from the memory-mapped file on first access
+        index._vectors = np.load(vectors_path, mmap_mode="r")
+        index._size = index._vectors.shape[0]
+        index.dimension = int(index._vectors.shape[1])
+        with open(os.path.join(path, cls.IDS_FILE), "r", encoding="utf-8") as f:
+            index._ids = json.load(f)
+        with open(os.path.join(path, cls.PAYLOADS_FILE), "r", encoding="utf-8") as f:
+            index._payloads = [json.loads(line) for line in f]
+        index._pos = {pid: i for i, pid in enumerate(index._ids)}
+        index._alive = np.ones(index._size, dtype=bool)
+        ivf_path = os.path.join(path, cls.IVF_FILE)
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                index._centroids = ivf["centroids"]
+                index._assignments = ivf["assignments"]
+        return index
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given for the local vector index snapshot")
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self.compact()
+            tmp = os.path.join(path, self.VECTORS_FILE + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(self._vectors[: self._size]))
+            os.replace(tmp, os.path.join(path, self.VECTORS_FILE))
+            with open(os.path.join(path, self.IDS_FILE), "w", encoding="utf-8") as f:
+                json.dump(self._ids, f)
+            with open(os.path.join(path, self.PAYLOADS_FILE), "w", encoding="utf-8") as f:
+                for payload in self._payloads:
+                    f.write(json.dumps(payload, default=str))
+                    f.write("\n")
+            ivf_path = os.path.join(path, self.IVF_FILE)
+            if self._centroids is not None:
+                np.savez(ivf_path, centroids=self._centroids, assignments=self._assignments)
+            elif os.path.exists(ivf_path):
+                os.remove(ivf_path)
+        self.path = path
+
+    def __len__(self) -> int:
+        return int(self._alive[: self._size].sum())
+
+    def _reserve(self, rows: int, dimension: int) -> None:
+        capacity = self._vectors.shape[0]
+        writable = isinstance(self._vectors, np.ndarray) and not isinstance(self._vectors, np.memmap)
+        if rows <= capacity and writable:
+            return
+        new_capacity = max(rows, capacity * 2, 1024)
+        grown = np.empty((new_capacity, dimension), dtype=np.float32)
+        if self._size:
+            grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._alive = alive
+
+    def upsert(self, ids: Sequence[str], vectors: np.ndarray, payloads: Sequence[dict]) -> None:
+        if not len(ids):
+            return
+        vectors = _normalize(vectors)
+        with self._lock:
+            if self.dimension is None or self._size == 0:
+                self.dimension = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+            self._reserve(self._size + len(ids), self.dimension)
+            for i, pid in enumerate(ids):
+                pid = str(pid)
+                row = self._pos.get(pid)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._pos[pid] = row
+                    self._ids.append(pid)
+                    self._payloads.append(None)
+                self._vectors[row] = vectors[i]
+                self._payloads[row] = dict(payloads[i] or {})
+                self._alive[row] = True
+            self._hotels = None
+            self._stays = None
+            # New rows are not assigned to IVF lists; fall back to exact search until rebuilt
+            self._centroids = None
+            self._assignments = None
+            self._lists = None
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            for pid in ids:
+                row = self._pos.get(str(pid))
+                if row is not None:
+                    self._alive[row] = False
+                    self._payloads[row] = None
+            self._hotels = None
+            self._stays = None
+
+    def compact(self) -> None:
+        with self._lock:
+            alive = np.flatnonzero(self._alive[: self._size])
+            if len(alive) == self._size:
+                return
+            self._vectors = np.ascontiguousarray(self._vectors[alive])
+            self._ids = [self._ids[i] for i in alive]
+            self._payloads = [self._payloads[i] for i in alive]
+            self._pos = {pid: i for i, pid in enumerate(self._ids)}
+            self._size = len(alive)
+            self._alive = np.ones(self._size, dtype=bool)
+            self._hotels = None
+            self._stays = None
+            self._centroids = None
+            self._assignments = None
+            self._lists = None
+
+    def build_ivf(self, n_lists: int, iterations: int = 10, seed: int = 0) -> None:
+        # Spherical k-means over the stored vectors; search then probes the closest lists
+        with self._lock:
+            self.compact()
+            data = self._vectors[: self._size]
+            if self._size == 0 or n_lists <= 0:
+                return
+            n_lists = min(n_lists, self._size)
+            rng = np.random.default_rng(seed)
+            centroids = np.array(data[rng.choice(self._size, n_lists, replace=False)])
+            for _ in range(iterations):
+                assignments = np.argmax(data @ centroids.T, axis=1)
+                for c in range(n_lists):
+                    members = data[assignments == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                centroids = _normalize(centroids)
+            self._centroids = centroids
+            self._assignments = np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+            self._lists = None
+
+    def _hotel_array(self) -> np.ndarray:
+        if self._hotels is None:
+            self._hotels = np.array(
+                [p.get("hotel_name") if p else None for p in self._payloads[: self._size]],
+                dtype=object,
+            )
+        return self._hotels
+
+    def _stay_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        # check_in_ts / check_out_ts payload columns; NaN where absent
+        if self._stays is None:
+            payloads = [p or {} for p in self._payloads[: self._size]]
+            self._stays = (
+                np.array([p.get("check_in_ts", np.nan) for p in payloads], dtype=np.float64),
+                np.array([p.get("check_out_ts", np.nan) for p in payloads], dtype=np.float64),
+            )
+        return self._stays
+
+    def _inverted_lists(self) -> List[np.ndarray]:
+        # Row ids per IVF list, ascending within each list
+        if self._lists is None:
+            order = np.argsort(self._assignments, kind="stable")
+            bounds = np.searchsorted(self._assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self._centroids))]
+        return self._lists
+
+    def _filter_rows(
+        self,
+        rows: Optional[np.ndarray],
+        hotel_name: Optional[str],
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> np.ndarray:
+        # rows=None means every stored row; filters are evaluated on the given rows only
+        # Bounds first, so a bad date raises the same ValueError as the Qdrant filter
+        gte = to_timestamp_bound(date_from) if date_from else None
+        lte = to_timestamp_bound(date_to) if date_to else None
+        if rows is None:
+            rows = np.arange(self._size)
+        mask = self._alive[rows]
+        if hotel_name:
+            mask &= self._hotel_array()[rows] == hotel_name
+        # Same semantics as the Qdrant Range conditions: a missing timestamp never matches
+        if gte is not None:
+            mask &= self._stay_arrays()[0][rows] >= gte
+        if lte is not None:
+            mask &= self._stay_arrays()[1][rows] <= lte
+        return rows[mask]
+
+    def _probe_rows(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        probes = _top_k(self._centroids @ query, n_probe)
+        lists = self._inverted_lists()
+        return np.sort(np.concatenate([lists[c] for c in probes]))
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 10,
+        hotel_name: Optional[str] = None,
+        n_probe: int = 0,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> List[Tuple[str, float, dict]]:
+        return self.search_batch(
+            np.asarray(query_vector)[None, :],
+            top_k,
+            [hotel_name],
+            n_probe=n_probe,
+            dates_from=[date_from],
+            dates_to=[date_to],
+        )[0]
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 10,
+        hotel_names: Optional[Sequence[Optional[str]]] = None,
+        n_probe: int = 0,
+        dates_from: Optional[Sequence[Optional[str]]] = None,
+        dates_to: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[Tuple[str, float, dict]]]:
+        queries = _normalize(query_vectors)
+        names = list(hotel_names) if hotel_names is not None else [None] * len(queries)
+        froms = list(dates_from) if dates_from is not None else [None] * len(queries)
+        tos = list(dates_to) if dates_to is not None else [None] * len(queries)
+        with self._lock:
+            if self._size == 0:
+                return [[] for _ in range(len(queries))]
+            data = self._vectors[: self._size]
+            out: List[List[Tuple[str, float, dict]]] = []
+            if self._centroids is not None and n_probe > 0:
+                # IVF: only the rows in each query's probed lists are filtered and scored,
+                # so the cost scales with n_probe / n_lists rather than the whole index
+                for qi in range(len(queries)):
+                    candidates = self._filter_rows(self._probe_rows(queries[qi], n_probe), names[qi], froms[qi], tos[qi])
+                    scores = data[candidates] @ queries[qi]
+                    best = _top_k(scores, top_k)
+                    out.append([(self._ids[candidates[j]], float(scores[j]), dict(self._payloads[candidates[j]])) for j in best])
+                return out
+            # Exact: one matrix product for the whole batch
+            scores = queries @ data.T
+            for qi in range(len(queries)):
+                candidates = self._filter_rows(None, names[qi], froms[qi], tos[qi])
+                best = candidates[_top_k(scores[qi, candidates], top_k)]
+                out.append([(self._ids[i], float(scores[qi, i]), dict(self._payloads[i])) for i in best])
+            return out
+
+    def retrieve(self, ids: Sequence[str]) -> Dict[str, Tuple[np.ndarray, dict]]:
+        out: Dict[str, Tuple[np.ndarray, dict]] = {}
+        with self._lock:
+            for pid in ids:
+                row = self._pos.get(str(pid))
+                if row is not None and self._alive[row]:
+                    out[str(pid)] = (np.array(self._vectors[row]), dict(self._payloads[row]))
+        return out
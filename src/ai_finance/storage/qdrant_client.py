@@ -1,61 +1,450 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
 
 from ai_finance.config import get_settings
+from ai_finance.matching.rerank import to_timestamp_array, to_timestamp_bound
+from ai_finance.pipeline.generation import get_index_generation
+from ai_finance.pooling import LoopLocal, ProcessLocal
+from ai_finance.storage.local_vectors import LocalVectorIndex
 
+if TYPE_CHECKING:
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+    from qdrant_client.models import Filter, HnswConfigDiff, SearchParams
+
+# qdrant_client (and httpx/grpc) are imported inside the functions that talk to the
+# server, so importing the matching modules stays cheap.
+PAYLOAD_INDEXES = {
+    "hotel_name": "keyword",
+    "check_in_ts": "integer",
+    "check_out_ts": "integer",
+}
+
+
+def _create_qdrant_client() -> QdrantClient:
+    import httpx
+    from qdrant_client import QdrantClient
 
-def get_qdrant_client() -> QdrantClient:
     settings = get_settings()
+    limits = httpx.Limits(
+        max_connections=settings.qdrant.pool_maxsize,
+        max_keepalive_connections=settings.qdrant.pool_maxsize,
+    )
     return QdrantClient(
         host=settings.qdrant.host,
         port=settings.qdrant.port,
+        grpc_port=settings.qdrant.grpc_port,
+        prefer_grpc=settings.qdrant.prefer_grpc,
+        https=settings.qdrant.use_https,
+        timeout=settings.qdrant.timeout,
+        transport=httpx.HTTPTransport(retries=settings.qdrant.max_retries, limits=limits),
+    )
+
+
+def _create_async_qdrant_client() -> AsyncQdrantClient:
+    import httpx
+    from qdrant_client import AsyncQdrantClient
+
+    settings = get_settings()
+    limits = httpx.Limits(
+        max_connections=settings.qdrant.pool_maxsize,
+        max_keepalive_connections=settings.qdrant.pool_maxsize,
+    )
+    return AsyncQdrantClient(
+        host=settings.qdrant.host,
+        port=settings.qdrant.port,
+        grpc_port=settings.qdrant.grpc_port,
+        prefer_grpc=settings.qdrant.prefer_grpc,
         https=settings.qdrant.use_https,
+        timeout=settings.qdrant.timeout,
+        transport=httpx.AsyncHTTPTransport(retries=settings.qdrant.max_retries, limits=limits),
     )
 
 
+def _open_local_index() -> LocalVectorIndex:
+    return LocalVectorIndex.load(get_settings().qdrant.local_path)
+
+
+_qdrant = ProcessLocal(_create_qdrant_client)
+_async_qdrant = LoopLocal(_create_async_qdrant_client)
+_local_index = ProcessLocal(_open_local_index)
+
+
+def _use_local() -> bool:
+    return get_settings().qdrant.backend == "local"
+
+
+def get_local_index() -> LocalVectorIndex:
+    return _local_index.get()
+
+
+def reset_local_index() -> None:
+    # The next call reloads the snapshot from the configured local_path
+    _local_index.reset()
+
+
+class _VectorCache:
+    # Bounded LRU of point id -> (vector, payload) for candidate-restricted scoring.
+    # Upserts and deletes in this process discard their ids; a reindex from another
+    # process (an Airflow run) shows up as a new index generation, which empties it.
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._generation: Optional[str] = None
+        self._items: "OrderedDict[str, Tuple[np.ndarray, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_generation(self, generation: str) -> None:
+        if generation != self._generation:
+            self._items.clear()
+            self._generation = generation
+
+    def get_many(self, ids: Sequence[str], generation: str) -> Dict[str, Tuple[np.ndarray, dict]]:
+        found: Dict[str, Tuple[np.ndarray, dict]] = {}
+        if self.max_items <= 0:
+            return found
+        with self._lock:
+            self._check_generation(generation)
+            for i in ids:
+                item = self._items.get(i)
+                if item is not None:
+                    self._items.move_to_end(i)
+                    found[i] = item
+        return found
+
+    def put_many(self, items: Dict[str, Tuple[np.ndarray, dict]], generation: str) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                # Fetched from an index that has been rebuilt since the lookup
+                return
+            for i, item in items.items():
+                self._items[i] = item
+                self._items.move_to_end(i)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def discard(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for i in ids:
+                self._items.pop(str(i), None)
+
+
+def _create_vector_cache() -> _VectorCache:
+    return _VectorCache(get_settings().qdrant.vector_cache_size)
+
+
+_vector_cache = ProcessLocal(_create_vector_cache)
+
+
+def get_qdrant_client() -> QdrantClient:
+    # One keep-alive connection pool (REST or gRPC channel) per process
+    return _qdrant.get()
+
+
+def reset_qdrant_client() -> None:
+    _qdrant.reset()
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    return _async_qdrant.get()
+
+
+async def close_async_qdrant_client() -> None:
+    client = _async_qdrant.pop()
+    if client is not None:
+        await client.close()
+
+
+def _quantization_config():
+    from qdrant_client import models
+
+    settings = get_settings()
+    mode = settings.qdrant.quantization
+    if mode == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=settings.qdrant.quantization_quantile,
+                always_ram=settings.qdrant.quantization_always_ram,
+            )
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=settings.qdrant.quantization_always_ram))
+    return None
+
+
+def _hnsw_config() -> HnswConfigDiff:
+    from qdrant_client import models
+
+    settings = get_settings()
+    return models.HnswConfigDiff(m=settings.qdrant.hnsw_m, ef_construct=settings.qdrant.hnsw_ef_construct)
+
+
+def _search_params() -> Optional[SearchParams]:
+    # Quantized search over-fetches by `oversampling` and rescores with the original vectors
+    from qdrant_client import models
+
+    settings = get_settings()
+    quantization = None
+    if settings.qdrant.quantization in ("scalar", "binary"):
+        quantization = models.QuantizationSearchParams(
+            ignore=False,
+            rescore=settings.qdrant.rescore,
+            oversampling=settings.qdrant.oversampling,
+        )
+    hnsw_ef = settings.qdrant.hnsw_ef or None
+    if quantization is None and hnsw_ef is None:
+        return None
+    return models.SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+
+
+def _ensure_payload_indexes(client: QdrantClient, existing: Dict) -> None:
+    # Keyword index for the hotel_name match and integer indexes for the stay range filters
+    from qdrant_client import models
+
+    settings = get_settings()
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field not in existing:
+            client.create_payload_index(
+                collection_name=settings.qdrant.collection_name,
+                field_name=field,
+                field_schema=models.PayloadSchemaType(schema),
+            )
+
+
+def project_payloads(documents: Sequence[dict]) -> List[dict]:
+    # Slim payloads: OpenSearch already holds the full documents, the vector side only
+    # needs what filtering and the stage-3 date rule read
+    spec = get_settings().qdrant.payload_fields.strip()
+    fields = None if spec == "*" else [f.strip() for f in spec.split(",") if f.strip()]
+    check_in = to_timestamp_array([d.get("check_in_date") for d in documents])
+    check_out = to_timestamp_array([d.get("check_out_date") for d in documents])
+    out: List[dict] = []
+    for i, doc in enumerate(documents):
+        payload = dict(doc) if fields is None else {f: doc.get(f) for f in fields if f in doc}
+        if not np.isnan(check_in[i]):
+            payload["check_in_ts"] = int(check_in[i])
+        if not np.isnan(check_out[i]):
+            payload["check_out_ts"] = int(check_out[i])
+        out.append(payload)
+    return out
+
+
+def _payload_selector():
+    # Return what was stored, so the server and the local backend hand back the same payloads
+    spec = get_settings().qdrant.payload_fields.strip()
+    if spec == "*":
+        return True
+    return [f.strip() for f in spec.split(",") if f.strip()] + ["check_in_ts", "check_out_ts"]
+
+
 def ensure_collection(dimension: int) -> None:
+    if _use_local():
+        get_local_index()
+        return
+    from qdrant_client import models
+
     settings = get_settings()
     client = get_qdrant_client()
     collections = client.get_collections().collections
     names = {c.name for c in collections}
+    quantization = _quantization_config()
     if settings.qdrant.collection_name not in names:
         client.create_collection(
             collection_name=settings.qdrant.collection_name,
-            vectors_config=VectorParams(size=dimension, distance=Distance.COSINE),
+            vectors_config=models.VectorParams(size=dimension, distance=models.Distance.COSINE, on_disk=settings.qdrant.on_disk),
+            hnsw_config=_hnsw_config(),
+            quantization_config=quantization,
+        )
+        _ensure_payload_indexes(client, {})
+        return
+    # Bring an existing collection in line with the configured storage layout; Qdrant
+    # rebuilds the affected segments in the background.
+    info = client.get_collection(settings.qdrant.collection_name)
+    config = info.config
+    hnsw = config.hnsw_config
+    vectors = config.params.vectors
+    if (
+        config.quantization_config != quantization
+        or hnsw.m != settings.qdrant.hnsw_m
+        or hnsw.ef_construct != settings.qdrant.hnsw_ef_construct
+        or bool(getattr(vectors, "on_disk", False)) != settings.qdrant.on_disk
+    ):
+        client.update_collection(
+            collection_name=settings.qdrant.collection_name,
+            vectors_config={"": models.VectorParamsDiff(on_disk=settings.qdrant.on_disk)},
+            hnsw_config=_hnsw_config(),
+            quantization_config=quantization or models.Disabled.DISABLED,
         )
+    _ensure_payload_indexes(client, info.payload_schema or {})
 
 
 def upsert_vectors(ids: List[str], vectors: np.ndarray, payloads: List[dict]) -> None:
+    payloads = project_payloads(payloads)
+    if _use_local():
+        get_local_index().upsert(ids, vectors, payloads)
+        _vector_cache.get().discard(ids)
+        return
     settings = get_settings()
     client = get_qdrant_client()
-    points = [
-        PointStruct(id=str(ids[i]), vector=vectors[i].tolist(), payload=payloads[i])
-        for i in range(len(ids))
-    ]
-    client.upsert(collection_name=settings.qdrant.collection_name, points=points)
+    # The array goes to the client as-is and is sliced into upsert batches there,
+    # without building a PointStruct and a Python list per vector.
+    client.upload_collection(
+        collection_name=settings.qdrant.collection_name,
+        vectors=np.ascontiguousarray(vectors, dtype=np.float32),
+        payload=payloads,
+        ids=[str(i) for i in ids],
+        batch_size=settings.qdrant.upsert_batch_size,
+        parallel=settings.qdrant.upsert_parallel,
+        wait=True,
+    )
+    _vector_cache.get().discard(ids)
+
+
+def delete_vectors(ids: Sequence[str]) -> None:
+    if not ids:
+        return
+    if _use_local():
+        get_local_index().delete(ids)
+        _vector_cache.get().discard(ids)
+        return
+    from qdrant_client import models
+
+    settings = get_settings()
+    client = get_qdrant_client()
+    client.delete(
+        collection_name=settings.qdrant.collection_name,
+        points_selector=models.PointIdsList(points=[str(i) for i in ids]),
+    )
+    _vector_cache.get().discard(ids)
+
+
+def flush_vectors() -> None:
+    # Persists the embedded index snapshot (and rebuilds IVF lists if configured);
+    # the Qdrant server persists on its own.
+    if not _use_local():
+        return
+    settings = get_settings()
+    index = get_local_index()
+    if settings.qdrant.local_ivf_lists > 0:
+        index.build_ivf(settings.qdrant.local_ivf_lists)
+    index.save(settings.qdrant.local_path)
+
+
+def count_vectors() -> int:
+    if _use_local():
+        return len(get_local_index())
+    settings = get_settings()
+    return int(get_qdrant_client().count(collection_name=settings.qdrant.collection_name, exact=True).count)
+
+
+def _points_to_vectors(points) -> Dict[str, Tuple[np.ndarray, dict]]:
+    return {
+        str(p.id): (np.asarray(p.vector, dtype=np.float32), dict(p.payload or {}))
+        for p in points
+        if p.vector is not None
+    }
+
+
+def retrieve_vectors(ids: Sequence[str]) -> Dict[str, Tuple[np.ndarray, dict]]:
+    # Stored vectors and payloads for exactly these ids, in one bulk retrieve call;
+    # ids that are not in the collection are absent from the result.
+    unique = list(dict.fromkeys(str(i) for i in ids))
+    cache = _vector_cache.get()
+    generation = get_index_generation()
+    found = cache.get_many(unique, generation)
+    missing = [i for i in unique if i not in found]
+    if missing and _use_local():
+        found.update(get_local_index().retrieve(missing))
+    elif missing:
+        settings = get_settings()
+        client = get_qdrant_client()
+        points = client.retrieve(
+            collection_name=settings.qdrant.collection_name,
+            ids=missing,
+            with_vectors=True,
+            with_payload=_payload_selector(),
+        )
+        fetched = _points_to_vectors(points)
+        cache.put_many(fetched, generation)
+        found.update(fetched)
+    return found
+
+
+async def retrieve_vectors_async(ids: Sequence[str]) -> Dict[str, Tuple[np.ndarray, dict]]:
+    unique = list(dict.fromkeys(str(i) for i in ids))
+    cache = _vector_cache.get()
+    generation = get_index_generation()
+    found = cache.get_many(unique, generation)
+    missing = [i for i in unique if i not in found]
+    if missing and _use_local():
+        found.update(get_local_index().retrieve(missing))
+    elif missing:
+        settings = get_settings()
+        client = get_async_qdrant_client()
+        points = await client.retrieve(
+            collection_name=settings.qdrant.collection_name,
+            ids=missing,
+            with_vectors=True,
+            with_payload=_payload_selector(),
+        )
+        fetched = _points_to_vectors(points)
+        cache.put_many(fetched, generation)
+        found.update(fetched)
+    return found
+
+
+def _search_filter(
+    hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Optional[Filter]:
+    # Same semantics as the OpenSearch filters: check_in >= date_from, check_out <= date_to.
+    # Bounds are parsed first, so a bad date is a ValueError naming it.
+    gte = to_timestamp_bound(date_from) if date_from else None
+    lte = to_timestamp_bound(date_to) if date_to else None
+    from qdrant_client import models
+
+    must = []
+    if hotel_name:
+        must.append(models.FieldCondition(key="hotel_name", match=models.MatchValue(value=hotel_name)))
+    if gte is not None:
+        must.append(models.FieldCondition(key="check_in_ts", range=models.Range(gte=gte)))
+    if lte is not None:
+        must.append(models.FieldCondition(key="check_out_ts", range=models.Range(lte=lte)))
+    return models.Filter(must=must) if must else None
 
 
 def search_similar(
     query_vector: np.ndarray,
     top_k: int = 10,
     hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
 ) -> List[Tuple[str, float, dict]]:
     settings = get_settings()
+    if _use_local():
+        return get_local_index().search(
+            query_vector,
+            top_k,
+            hotel_name,
+            n_probe=settings.qdrant.local_ivf_probe,
+            date_from=date_from,
+            date_to=date_to,
+        )
     client = get_qdrant_client()
-    qfilter: Optional[Filter] = None
-    if hotel_name:
-        qfilter = Filter(must=[FieldCondition(key="hotel_name", match=MatchValue(value=hotel_name))])
     result = client.search(
         collection_name=settings.qdrant.collection_name,
         query_vector=query_vector.tolist(),
         limit=top_k,
-        query_filter=qfilter,
-        with_payload=True,
+        query_filter=_search_filter(hotel_name, date_from, date_to),
+        search_params=_search_params(),
+        with_payload=_payload_selector(),
         score_threshold=None,
     )
     output: List[Tuple[str, float, dict]] = []
@@ -64,3 +453,72 @@ def search_similar(
     return output
 
 
+async def search_similar_async(
+    query_vector: np.ndarray,
+    top_k: int = 10,
+    hotel_name: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[Tuple[str, float, dict]]:
+    settings = get_settings()
+    if _use_local():
+        return get_local_index().search(
+            query_vector,
+            top_k,
+            hotel_name,
+            n_probe=settings.qdrant.local_ivf_probe,
+            date_from=date_from,
+            date_to=date_to,
+        )
+    client = get_async_qdrant_client()
+    result = await client.search(
+        collection_name=settings.qdrant.collection_name,
+        query_vector=query_vector.tolist(),
+        limit=top_k,
+        query_filter=_search_filter(hotel_name, date_from, date_to),
+        search_params=_search_params(),
+        with_payload=_payload_selector(),
+        score_threshold=None,
+    )
+    return [(str(r.id), float(r.score), dict(r.payload or {})) for r in result]
+
+
+def search_similar_batch(
+    query_vectors: np.ndarray,
+    top_k: int = 10,
+    hotel_names: Optional[Sequence[Optional[str]]] = None,
+    dates_from: Optional[Sequence[Optional[str]]] = None,
+    dates_to: Optional[Sequence[Optional[str]]] = None,
+) -> List[List[Tuple[str, float, dict]]]:
+    if len(query_vectors) == 0:
+        return []
+    settings = get_settings()
+    if _use_local():
+        return get_local_index().search_batch(
+            query_vectors,
+            top_k,
+            hotel_names,
+            n_probe=settings.qdrant.local_ivf_probe,
+            dates_from=dates_from,
+            dates_to=dates_to,
+        )
+    from qdrant_client import models
+
+    client = get_qdrant_client()
+    names = list(hotel_names) if hotel_names is not None else [None] * len(query_vectors)
+    froms = list(dates_from) if dates_from is not None else [None] * len(query_vectors)
+    tos = list(dates_to) if dates_to is not None else [None] * len(query_vectors)
+    params = _search_params()
+    selector = _payload_selector()
+    requests = [
+        models.SearchRequest(
+            vector=query_vectors[i].tolist(),
+            limit=top_k,
+            filter=_search_filter(names[i], froms[i], tos[i]),
+            params=params,
+            with_payload=selector,
+        )
+        for i in range(len(query_vectors))
+    ]
+    results = client.search_batch(collection_name=settings.qdrant.collection_name, requests=requests)
+    return [[(str(r.id), float(r.score), dict(r.payload or {})) for r in result] for result in results]